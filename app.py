@@ -3,6 +3,7 @@ from meta_data import *
 from matrix import *
 from convert_utils import *
 from delteE import *
+from delta_e_report import DeltaEReport
 from icc_rw import ICCProfile
 from color_test_suit import *
 from color_rw import ColorReader, ColorWriter
@@ -35,6 +36,9 @@ import sys
 import re
 import os
 
+# 灰阶采样点数不超过该值时，先用保序回归 + PCHIP 拟合平滑曲线再生成 LUT（见 lut.fit_monotone_curve）
+PQ_SMOOTH_MAX_POINTS = 65
+
 
 class HDRCalibrationUI:
     def __init__(self, root):
@@ -285,7 +289,7 @@ class HDRCalibrationUI:
         pq_points_menu = ttk.Combobox(
             button_frame,
             textvariable=self.pq_points_var,
-            values=["128", "256", "512", "1024"],
+            values=["33", "65", "128", "256", "512", "1024"],
             font=("Microsoft YaHei", 16),
             width=6,
             state="readonly",
@@ -441,10 +445,7 @@ class HDRCalibrationUI:
         self.icc_data = self.icc_handle.read_all()
         self.MHC2 = copy.deepcopy(self.icc_data["MHC2"])
         if self.MHC2["red_lut"] == [0, 1]:
-            self.MHC2["red_lut"] = generate_pq_lut().tolist()
-            self.MHC2["green_lut"] = generate_pq_lut().tolist()
-            self.MHC2["blue_lut"] = generate_pq_lut().tolist()
-            self.MHC2["entry_count"] = len(self.MHC2["red_lut"])
+            Lut1D3(generate_pq_lut(), copy=False).to_mhc2(self.MHC2)
 
     def set_dpi_awareness(self):
         try:
@@ -1212,10 +1213,7 @@ class HDRCalibrationUI:
         but currently I can't get dogegen to display in fullscreen.
         """
         if self.bright_var.get():
-            lut = generate_inversed_lut(generate_bright_pq_lut())
-            bright_lut_inv = {"red_lut": lut.tolist(),
-                              "green_lut": lut.tolist(),
-                              "blue_lut": lut.tolist()}
+            bright_lut_inv = Lut1D3(generate_inversed_lut(generate_bright_pq_lut()), copy=False)
 
             white_rgb_fix = apply_lut(XYZ_to_BT2020_PQ_rgb(self.measure_gamut_xyz["white"]/10000), bright_lut_inv)
             black_rgb_fix = apply_lut(XYZ_to_BT2020_PQ_rgb(self.measure_gamut_xyz["black"]/10000), bright_lut_inv)
@@ -1265,17 +1263,36 @@ class HDRCalibrationUI:
         source_xy = XYZ_to_xy(source_white_XYZ / 10000)
         target_wp = [float(x.strip()) for x in self.white_point_var.get().split(",")]
         m = calculate_bradford_matrix(source_xy.tolist(), target_wp)
-        for itm in self.target_xyz:
-            pq = XYZ_to_BT2020_PQ_rgb(itm)
-            rgb = (pq * 1023).round().astype(int)
+        target_codes = XYZ_to_BT2020_PQ_code(self.target_xyz, bit_depth=10)
+
+        def measure(rgb):
             self.proc_color_write.write_rgb(rgb, delay=0.1)
             XYZ = self.proc_color_reader.read_XYZ()
             XYZ = [float(itm) / 10000 for itm in XYZ]
-            XYZ = m@XYZ
+            return m@XYZ
+
+        for itm, rgb in zip(self.target_xyz, target_codes):
+            XYZ = measure(rgb)
             logging.info(_("({}) Color: {} Target XYZ:{} Measured: {}").format(i/l, rgb , itm, XYZ))
             self.measured_xyz.append(XYZ)
             i += 1
-        matrix = fit_XYZ2XYZ_wlock_dropY(self.measured_xyz, self.target_xyz,self.measured_xyz[-1], self.target_xyz[-1])
+        # 稳健拟合：仪器误读的色块被降权并标记，只重测这些色块一次后再拟合
+        # 最后一个色块是白点约束，不参与离群判定
+        matrix, info = fit_XYZ2XYZ_wlock_dropY_robust(self.measured_xyz, self.target_xyz,
+                                                      self.measured_xyz[-1], self.target_xyz[-1], loss="tukey")
+        outliers = np.flatnonzero(info["outliers"][:-1])
+        if outliers.size:
+            logging.info(_("Outlier patches {}, re-measuring").format(outliers.tolist()))
+            for idx in outliers:
+                self.measured_xyz[idx] = measure(target_codes[idx])
+                logging.info(_("Color: {} Target XYZ:{} Re-measured: {}").format(
+                    target_codes[idx], self.target_xyz[idx], self.measured_xyz[idx]))
+            matrix, info = fit_XYZ2XYZ_wlock_dropY_robust(self.measured_xyz, self.target_xyz,
+                                                          self.measured_xyz[-1], self.target_xyz[-1], loss="tukey")
+            outliers = np.flatnonzero(info["outliers"][:-1])
+            if outliers.size:
+                logging.info(_("Patches {} are still outliers after re-measuring, weights: {}").format(
+                    outliers.tolist(), info["weights"][outliers].round(3).tolist()))
         # matrix = fit_XYZ2XYZ(self.measure_convert_xyz, self.convert_xyz)
         ori_matrix = np.array(self.MHC2["matrix"]).reshape(3, 3)
         matrix2 = ori_matrix @ matrix
@@ -1286,9 +1303,10 @@ class HDRCalibrationUI:
     def calibrate_white_by_lut(self):
         logging.info(_("Start calibrating grayscale chromaticity to D65"))
         MEASURE_POINTS_COUNT = 32
-        pq_lut_origin = {"red": copy.deepcopy(self.MHC2["red_lut"]),
-                         "green": copy.deepcopy(self.MHC2["green_lut"]),
-                         "blue": copy.deepcopy(self.MHC2["blue_lut"])}
+        # Lut1D 只读，原始 LUT 可直接共享，无需深拷贝
+        pq_lut_origin = {"red": Lut1D(self.MHC2["red_lut"], copy=False),
+                         "green": Lut1D(self.MHC2["green_lut"], copy=False),
+                         "blue": Lut1D(self.MHC2["blue_lut"], copy=False)}
         max_nit = 0
         self.proc_color_write.write_rgb([1023,1023,1023], delay=0.3)
         XYZ = self.proc_color_reader.read_XYZ()
@@ -1315,9 +1333,9 @@ class HDRCalibrationUI:
                 logging.info(_("Grayscale {} target {} nit is 0, skip").format(grayscale, nit))
                 scales.append({"grayscale":grayscale, "red": None, "green": None, "blue": None})
                 continue
-            self.MHC2["red_lut"]     = copy.deepcopy(pq_lut_origin["red"])
-            self.MHC2["green_lut"]   = copy.deepcopy(pq_lut_origin["green"])
-            self.MHC2["blue_lut"]    = copy.deepcopy(pq_lut_origin["blue"])
+            self.MHC2["red_lut"]     = pq_lut_origin["red"]
+            self.MHC2["green_lut"]   = pq_lut_origin["green"]
+            self.MHC2["blue_lut"]    = pq_lut_origin["blue"]
             self.MHC2["entry_count"] = len(pq_lut_origin["red"])
             self.icc_handle.write_MHC2(self.MHC2)
             rgb_pq = [int(grayscale)] * 3
@@ -1376,9 +1394,9 @@ class HDRCalibrationUI:
                         else:
                             done = True
                         scale = total_scale + current_scale - 1
-                        pq_lut_scale = lut_scale(pq_lut_origin[channel], scale)
+                        pq_lut_scale = lut_scale(pq_lut_origin[channel].values, scale)
                         pq_lut_scale[0] = 0
-                        self.MHC2[f"{channel}_lut"] = pq_lut_scale.tolist()
+                        self.MHC2[f"{channel}_lut"] = Lut1D(pq_lut_scale, copy=False)
                         self.icc_handle.write_MHC2(self.MHC2)
                         last_ratio = ratio
                         if done:
@@ -1397,9 +1415,9 @@ class HDRCalibrationUI:
                 grayscale, measure_xyz, target_rgb_pq, measure_rgb_pq))
         logging.info(_("All grayscale calibration finished, scales: {}").format(scales))
         last_activated_scale = None
-        target_pq_lut_red = copy.deepcopy(pq_lut_origin["red"])
-        target_pq_lut_green = copy.deepcopy(pq_lut_origin["green"])
-        target_pq_lut_blue = copy.deepcopy(pq_lut_origin["blue"])
+        target_pq_lut_red = pq_lut_origin["red"].to_array()
+        target_pq_lut_green = pq_lut_origin["green"].to_array()
+        target_pq_lut_blue = pq_lut_origin["blue"].to_array()
         if scales[0]["grayscale"] == 0:
             scales[0] = copy.deepcopy(scales[1])
             scales[0]["grayscale"] = 0
@@ -1448,10 +1466,7 @@ class HDRCalibrationUI:
             lgscale = cgscale
             lbscale = cbscale
             lgrayscale = cgrayscale
-        self.MHC2["red_lut"]     = target_pq_lut_red
-        self.MHC2["green_lut"]   = target_pq_lut_green
-        self.MHC2["blue_lut"]    = target_pq_lut_blue
-        self.MHC2["entry_count"] = len(target_pq_lut_red)
+        Lut1D3(target_pq_lut_red, target_pq_lut_green, target_pq_lut_blue, copy=False).to_mhc2(self.MHC2)
         self.icc_handle.write_MHC2(self.MHC2)
 
         return
@@ -1467,25 +1482,31 @@ class HDRCalibrationUI:
         Y_threshold = max(ref_Y * 0.0005, 0.1)
         target_wp = [float(x.strip()) for x in self.white_point_var.get().split(",")]
 
-        for idx, grayscale in enumerate(np.linspace(0, 1023, num, endpoint=True).round().astype(np.int32)):
+        grayscales = np.linspace(0, 1023, num, endpoint=True).round().astype(np.int32)
+        measured_XYZ = np.empty((num, 3))
+        for idx, grayscale in enumerate(grayscales):
             grayscale = int(grayscale)
             rgb = [grayscale, grayscale, grayscale]
             self.proc_color_write.write_rgb(rgb, delay=0.03)
-            XYZ = np.array(self.proc_color_reader.read_XYZ(), dtype=float)
-            if XYZ[1] > Y_threshold:
-                measured_xy = XYZ_to_xy(XYZ / 10000).tolist()
-                m_point     = calculate_bradford_matrix(measured_xy, target_wp)
-                XYZ_corrected = np.clip(m_point @ (XYZ / 10000), 0, None)
-            else:
+            measured_XYZ[idx] = np.array(self.proc_color_reader.read_XYZ(), dtype=float)
+            logging.info(_("({}/{}) Measure RGB: {} Result: {}").format(idx+1, num, rgb, measured_XYZ[idx]))
+
+        # 所有灰阶一次性校正到目标白点（每个灰阶以自身实测 xy 为源白点），只有色适应是批量的
+        valid = measured_XYZ[:, 1] > Y_threshold
+        XYZ_norm = measured_XYZ[valid] / 10000
+        XYZ_corrected = np.clip(adapt_XYZ(XYZ_norm, XYZ_to_xy(XYZ_norm), target_wp, "bradford"), 0, None)
+        rgb_measured_all = np.empty((num, 3))
+        rgb_measured_all[valid] = XYZ_to_BT2020_PQ_rgb(XYZ_corrected)
+        for idx, grayscale in enumerate(grayscales):
+            rgb = [int(grayscale)] * 3
+            if not valid[idx]:
                 pq_theory = grayscale / 1023.0
                 logging.info(_("({}/{}) Output RGB: {} below threshold ({:.4f} nit), using theory PQ: {:.6f}").format(idx+1, num, rgb, Y_threshold, pq_theory))
-                self.measured_pq["red"].append(pq_theory)
-                self.measured_pq["green"].append(pq_theory)
-                self.measured_pq["blue"].append(pq_theory)
-                continue  # ← 直接跳過後面的 XYZ_to_BT2020_PQ_rgb
-                 
-            rgb_measured = XYZ_to_BT2020_PQ_rgb(XYZ_corrected)
-            logging.info(_("({}/{}) Output RGB: {} Measured XYZ: {} RGB: {} Luminance: {:.4f} nit").format(idx+1, num, rgb, XYZ, rgb_measured*1023, float(XYZ[1])))
+                rgb_measured = [pq_theory] * 3
+            else:
+                rgb_measured = rgb_measured_all[idx]
+                XYZ = measured_XYZ[idx]
+                logging.info(_("({}/{}) Output RGB: {} Measured XYZ: {} RGB: {} Luminance: {:.4f} nit").format(idx+1, num, rgb, XYZ, rgb_measured*1023, float(XYZ[1])))
             self.measured_pq["red"].append(float(rgb_measured[0]))
             self.measured_pq["green"].append(float(rgb_measured[1]))
             self.measured_pq["blue"].append(float(rgb_measured[2]))
@@ -1499,16 +1520,20 @@ class HDRCalibrationUI:
                 eetf_args["monitor_min"] = self.measure_gamut_xyz["min_activated_black"][1]
         target_pq = self.MHC2
         if self.bright_var.get():
-            target_pq = {"red_lut": generate_bright_pq_lut().tolist(),
-                         "green_lut": generate_bright_pq_lut().tolist(),
-                         "blue_lut": generate_bright_pq_lut().tolist()}
+            bright_lut = Lut1D(generate_bright_pq_lut(), copy=False)
+            target_pq = {"red_lut": bright_lut,
+                         "green_lut": bright_lut,
+                         "blue_lut": bright_lut}
         
-        red_lut = generate_mhc2_lut_from_measured_pq(
-            self.measured_pq["red"], target_pq=target_pq["red_lut"])
-        blue_lut = generate_mhc2_lut_from_measured_pq(
-            self.measured_pq["blue"], target_pq=target_pq["blue_lut"])
-        green_lut = generate_mhc2_lut_from_measured_pq(
-            self.measured_pq["green"], target_pq=target_pq["green_lut"])
+        channels = Lut1D3.CHANNELS
+        smooth = num <= PQ_SMOOTH_MAX_POINTS
+        lut3, residuals = generate_mhc2_lut_from_measured_pq_batch(
+            [self.measured_pq[c] for c in channels],
+            target_pq=np.stack([np.asarray(target_pq[c + "_lut"], dtype=float) for c in channels]),
+            smooth=smooth, return_residuals=True)
+        for channel, res in zip(channels, residuals):
+            logging.info(_("PQ curve fit residuals ({}, smooth: {}): max {:.6f}, per point: {}").format(
+                channel, smooth, float(np.max(np.abs(res))), np.round(res, 6).tolist()))
         
         
             
@@ -1519,10 +1544,7 @@ class HDRCalibrationUI:
             # green_lut = generate_mhc2_lut_from_measured_pq(
             #     green_lut, target_pq=target_pq["green_lut"])
 
-        self.MHC2["red_lut"] = red_lut.tolist()
-        self.MHC2["green_lut"] = green_lut.tolist()
-        self.MHC2["blue_lut"] = blue_lut.tolist()
-        self.MHC2["entry_count"] = len(red_lut)
+        Lut1D3(lut3, copy=False).to_mhc2(self.MHC2)
         self.icc_handle.write_MHC2(self.MHC2)
         logging.info(_("PQ LUT measurement finished"))
 
@@ -1588,8 +1610,9 @@ class HDRCalibrationUI:
             measured_colored_xyz = []
             num = len(target_colored_xyz)
             logging.info(_("Start measuring color points"))
+            target_colored_codes = XYZ_to_BT2020_PQ_code(target_colored_xyz, bit_depth=10).tolist()
             for idx, xyz in enumerate(target_colored_xyz):
-                rgb = (XYZ_to_BT2020_PQ_rgb(xyz) * 1023).round().astype(int).tolist()
+                rgb = target_colored_codes[idx]
                 self.proc_color_write.write_rgb(rgb, delay=0.1)
                 XYZ = np.array(self.proc_color_reader.read_XYZ())
                 logging.info(_("({}/{}) Measure RGB: {} Target XYZ:{} Result: {}").format(
@@ -1625,34 +1648,32 @@ class HDRCalibrationUI:
             max_care_nit = result["measured_xyz"][-1][1] * 0.9
             logging.info(_("Measured min luminance: {} nit, max luminance: {} nit").format(
                 min_care_nit*10000, max_care_nit*10000))
-            white_de_result = []
             logging.info(_("Start computing grayscale deltaE_ITP"))
-            for idx in range(len(result["measured_xyz"])):
-                if min_care_nit < result["measured_xyz"][idx][1] < max_care_nit:
-                    t = result["target_xyz"][idx]
-                    m = result["measured_xyz"][idx]
-                    de = XYZdeltaE_ITP(t, m)
-                    white_de_result.append([t, m, de])
-                    logging.info(_("Target: {} Measured: {} dE_ITP: {}").format(
-                        t, m, de.round(2)))
-            colored_de_result = []
+            measured_Y = result["measured_xyz"][:, 1]
+            in_range = (min_care_nit < measured_Y) & (measured_Y < max_care_nit)
+            white_report = DeltaEReport()
+            white_de = white_report.add(result["target_xyz"], result["measured_xyz"], mask=in_range)["itp"]
+            for idx in np.flatnonzero(in_range):
+                logging.info(_("Target: {} Measured: {} dE_ITP: {}").format(
+                    result["target_xyz"][idx], result["measured_xyz"][idx], white_de[idx].round(2)))
             logging.info(_("Start computing color deltaE_ITP"))
-            for idx in range(len(result["measured_colored_xyz"])):
-                t = result["target_colored_xyz"][idx]
-                m = result["measured_colored_xyz"][idx]
-                de = XYZdeltaE_ITP(t, m)
-                colored_de_result.append([t, m, de])
+            colored_report = DeltaEReport()
+            colored_de = colored_report.add(result["target_colored_xyz"], result["measured_colored_xyz"])["itp"]
+            for idx in range(len(colored_de)):
                 logging.info(_("Target: {} Measured: {} dE_ITP: {}").format(
-                    t, m, de.round(2)))
-            white_de_avg = np.mean([itm[2] for itm in white_de_result]).round(2)
-            white_de_max = np.max([itm[2] for itm in white_de_result]).round(2)
-            colored_de_avg = np.mean([itm[2] for itm in colored_de_result]).round(2)
-            colored_de_max = np.max([itm[2] for itm in colored_de_result]).round(2)
+                    result["target_colored_xyz"][idx], result["measured_colored_xyz"][idx],
+                    colored_de[idx].round(2)))
+            white_stats = white_report.summary()
+            colored_stats = colored_report.summary()
             logging.info(_("Within luminance range ({}-{}), grayscale average deltaE_ITP: {}, max deltaE_ITP: {}").format(
                 round(min_care_nit*10000,2), round(max_care_nit*10000,2),
-                white_de_avg, white_de_max))
+                round(white_stats["itp"]["mean"], 2), round(white_stats["itp"]["max"], 2)))
             logging.info(_("At 200 nit D65 white, color average deltaE_ITP: {}, max deltaE_ITP: {}").format(
-                colored_de_avg, colored_de_max))
+                round(colored_stats["itp"]["mean"], 2), round(colored_stats["itp"]["max"], 2)))
+            for stats in (white_stats, colored_stats):
+                logging.info(_("deltaE_ITP P50/P95/P99: {} / {} / {}, deltaE2000 average: {}, max: {}").format(
+                    *(round(stats["itp"][k], 2) for k in ("p50", "p95", "p99")),
+                    round(stats["2000"]["mean"], 2), round(stats["2000"]["max"], 2)))
         self.run_in_thread(m, cb)
     
     def _show_pq_plot(self, target_pq, measured_pq):
@@ -1754,7 +1775,6 @@ class HDRCalibrationUI:
         with open("data\\verify_video_extended_smpte2084_1000_p3_2020.ti1", "r") as f:
             lines = f.readlines()
         data_section = False
-        rgb_list = []
         xyz_list = []
         for line in lines:
             line = line.strip()
@@ -1768,12 +1788,7 @@ class HDRCalibrationUI:
                 t = list(map(float, parts))
                 xyz = [itm * 6 / 10000 for itm in t[4:7]]
                 xyz_list.append(xyz)
-                rgb_list.append(
-                    [
-                        round(float(itm) * 1023)
-                        for itm in XYZ_to_BT2020_PQ_rgb(xyz).tolist()
-                    ]
-                )
+        rgb_list = XYZ_to_BT2020_PQ_code(xyz_list, bit_depth=10).tolist()
 
         self.proc_color_write = ColorWriter()
         args = self.get_spotread_args()
@@ -1807,6 +1822,8 @@ class HDRCalibrationUI:
             pass
         def m():
             real_xyz = []
+            de_list = []
+            report = DeltaEReport(keep_samples=False)
             logging.info(_("Measured RGB list: {}").format(rgb_list))
             l = len(rgb_list)
             for i, rgb in enumerate(rgb_list):
@@ -1815,18 +1832,21 @@ class HDRCalibrationUI:
                 logging.info(_("({}/{}) Measure RGB: {} Target XYZ:{} Result: {}").format(
                     i+1, l, rgb, xyz_list[i], XYZ))
                 real_xyz.append([float(itm) / 10000 for itm in XYZ])
+                # 逐个色块累积统计，测量过程中即可得到当前的平均 / 最大 / 百分位
+                de_list.append(float(report.add(xyz_list[i], real_xyz[-1])["itp"][0]))
 
             self.clean_color_rw_process()
-            de_list = []
-            for idx in range(len(real_xyz)):
-                de = XYZdeltaE_ITP(real_xyz[idx], xyz_list[idx])
-                de_list.append(de)
+            for idx, de in enumerate(de_list):
                 logging.info(_("Target {}: {}").format(xyz_list[idx], de))
             logging.info(_("Measured XYZ list: {}").format(xyz_list))
             logging.info(_("Measured actual XYZ values: {}").format(real_xyz))
             logging.info(_("Measured color differences: {}").format(de_list))
+            stats = report.summary()
             logging.info(_("Average color difference: {}, maximum difference: {}").format(
-                sum(de_list) / len(de_list), max(de_list)))
+                stats["itp"]["mean"], stats["itp"]["max"]))
+            logging.info(_("deltaE_ITP P50/P95/P99: {} / {} / {}, deltaE2000 average: {}, max: {}").format(
+                *(round(stats["itp"][k], 2) for k in ("p50", "p95", "p99")),
+                round(stats["2000"]["mean"], 2), round(stats["2000"]["max"], 2)))
 
         self.run_in_thread(m, cb)
 
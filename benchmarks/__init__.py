@@ -0,0 +1,140 @@
+"""
+微基准测试公共框架。
+
+每个子模块（如 benchmarks.lut）定义 CASES：{名称: setup()}，setup 返回无参可调用对象，
+再调用 main(CASES, "lut") 即可作为 `python -m benchmarks.<模块>` 运行：
+
+    python -m benchmarks.lut                    # 运行并与基线比较（基线存在时）
+    python -m benchmarks.lut --save             # 运行并写入基线
+    python -m benchmarks.lut --threshold 15     # 变慢超过 15% 记为回退，退出码 1
+    python -m benchmarks.lut -k eetf            # 只运行名称包含 eetf 的用例
+
+基线为 JSON，默认存放在 benchmarks/baselines/<模块>.json，记录每个用例单次调用的最短耗时（秒）。
+基线与机器相关，不纳入版本库。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+DEFAULT_THRESHOLD = 10.0
+
+
+def time_call(fn, repeat=5, min_time=0.05):
+    """
+    返回 fn() 单次调用的最短耗时（秒）。
+    先自动确定每轮循环次数使单轮 >= min_time，再重复 repeat 轮取最小值。
+    """
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed * 1.2))
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+def run_cases(cases, pattern=None, repeat=5, min_time=0.05, log=print):
+    """运行 cases 中名称包含 pattern 的用例，返回 {名称: 秒}。"""
+    results = {}
+    for name, setup in cases.items():
+        if pattern and pattern not in name:
+            continue
+        fn = setup()
+        fn()  # 预热（含各类缓存的首次构建）
+        results[name] = time_call(fn, repeat, min_time)
+        log(f"{name:<60s} {results[name]*1e3:12.4f} ms")
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    与基线比较，返回 (回退列表, 报告行列表)。
+    回退：耗时比基线增加超过 threshold 百分比。基线中没有的用例只报告不判定。
+    """
+    regressions = []
+    lines = []
+    for name, sec in results.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:<60s} {'new':>10s}")
+            continue
+        change = (sec / base - 1.0) * 100.0 if base > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append((name, base, sec, change))
+        lines.append(f"{name:<60s} {change:+9.1f}%{flag}")
+    return regressions, lines
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main(cases, suite, argv=None):
+    parser = argparse.ArgumentParser(prog=f"python -m benchmarks.{suite}")
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baselines", f"{suite}.json"),
+                        help="基线 JSON 路径")
+    parser.add_argument("--save", action="store_true", help="把本次结果写入基线")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="判定回退的变慢百分比（默认 %(default)s）")
+    parser.add_argument("-k", dest="pattern", default=None, help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="每轮最短计时（秒）")
+    args = parser.parse_args(argv)
+
+    results = run_cases(cases, args.pattern, args.repeat, args.min_time)
+
+    if args.save:
+        if args.pattern and os.path.exists(args.baseline):
+            merged = load_baseline(args.baseline)
+            merged.update(results)
+            results = merged
+        save_baseline(args.baseline, results)
+        print(f"baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save to create one")
+        return 0
+    regressions, lines = compare(results, load_baseline(args.baseline), args.threshold)
+    print()
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        return 1
+    return 0
@@ -0,0 +1,73 @@
+"""
+convert_utils 转换函数的微基准：python -m benchmarks.convert_utils [--save] [--threshold PCT]
+small/* 为单个 (3,) 样本的单次调用开销，large/* 为 1e6 个样本的吞吐。
+"""
+import sys
+
+import numpy as np
+
+from benchmarks import main
+from convert_utils import XYZ_to_xy, XYZ_to_xyY, xyY_to_XYZ, pq_encode, pq_decode, XYZ_to_ictcp
+from color_test_suit import ymax_for_many_with_M
+from matrix import build_rgb_to_xyz_from_primaries
+
+LARGE = 1_000_000
+
+
+def _XYZ(n, dtype=np.float64, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.random((n, 3)) * 0.1 + 1e-4).astype(dtype)
+
+
+def _xyY(n, dtype=np.float64, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0.15, 0.6, n)
+    y = rng.uniform(0.1, 0.35, n)
+    return np.column_stack([x, y, rng.random(n) * 1000]).astype(dtype)
+
+
+def _bench(fn, data, **kwargs):
+    return lambda: fn(data, **kwargs)
+
+
+def _bench_out(fn, data, out, **kwargs):
+    return lambda: fn(data, out=out, **kwargs)
+
+
+def build_cases():
+    cases = {}
+    funcs = (("XYZ_to_xy", XYZ_to_xy, _XYZ, 2), ("XYZ_to_xyY", XYZ_to_xyY, _XYZ, 3),
+             ("xyY_to_XYZ", xyY_to_XYZ, _xyY, 3))
+    for name, fn, make, n_out in funcs:
+        cases[f"small/{name}/list"] = lambda fn=fn, make=make: _bench(fn, make(1)[0].tolist())
+        cases[f"small/{name}/array"] = lambda fn=fn, make=make: _bench(fn, make(1)[0])
+        cases[f"small/{name}/clean"] = lambda fn=fn, make=make: _bench(fn, make(1)[0], assume_clean=True)
+        for dtype in (np.float64, np.float32):
+            tag = np.dtype(dtype).name
+            cases[f"large/{name}/{tag}"] = \
+                lambda fn=fn, make=make, dtype=dtype: _bench(fn, make(LARGE, dtype), dtype=dtype)
+            cases[f"large/{name}/{tag}/clean_out"] = \
+                lambda fn=fn, make=make, dtype=dtype, n_out=n_out: _bench_out(
+                    fn, make(LARGE, dtype), np.empty((LARGE, n_out), dtype), assume_clean=True, dtype=dtype)
+
+    M = build_rgb_to_xyz_from_primaries((0.64, 0.33), (0.30, 0.60), (0.15, 0.06), (0.3127, 0.329))
+    cases["large/ymax_for_many_with_M/n=10000"] = \
+        lambda: (lambda xys=_xyY(10000)[:, :2]: ymax_for_many_with_M(M, xys))
+
+    v = np.random.default_rng(0).random(LARGE)
+    for fast in (False, True):
+        cases[f"large/pq_encode/fast={int(fast)}"] = lambda fast=fast: _bench(pq_encode, v, fast=fast)
+        cases[f"large/pq_decode/fast={int(fast)}"] = lambda fast=fast: _bench(pq_decode, v, fast=fast)
+    for dtype in (np.float64, np.float32):
+        tag = np.dtype(dtype).name
+        cases[f"large/pq_encode/{tag}"] = \
+            lambda dtype=dtype: _bench(pq_encode, v.astype(dtype), fast=False, dtype=dtype)
+        cases[f"large/XYZ_to_ictcp/{tag}"] = \
+            lambda dtype=dtype: _bench(XYZ_to_ictcp, _XYZ(LARGE, dtype), dtype=dtype)
+    return cases
+
+
+CASES = build_cases()
+
+if __name__ == "__main__":
+    sys.exit(main(CASES, "convert_utils"))
@@ -0,0 +1,114 @@
+"""
+lut.py 热点路径的微基准：python -m benchmarks.lut [--save] [--threshold PCT]
+规模覆盖实测点数 17–1024、LUT 长度 1024–65536。
+"""
+import sys
+
+import numpy as np
+
+from benchmarks import main
+from lut import (
+    convert_transfer,
+    eetf_from_lut,
+    generate_inversed_lut,
+    generate_mhc2_lut_from_measure_data,
+    generate_mhc2_lut_from_measured_pq,
+    generate_mhc2_lut_from_measured_pq_batch,
+    linear_interpolate,
+    linear_interpolate_plateau_fix,
+)
+from convert_utils import pq_eotf
+
+MEASURED_POINTS = (17, 33, 256, 1024)
+LUT_SIZES = (1024, 4096, 65536)
+EETF_ARGS = {"source_min": 0.0, "source_max": 10000.0, "monitor_min": 0.05, "monitor_max": 800.0}
+
+
+def _measured_pq(n, seed=0):
+    """模拟实测灰阶 PQ：略偏离恒等、带少量噪声与顶部平坦区。"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, n)
+    y = np.clip(x ** 1.05 + rng.normal(0, 2e-3, n), 0, 0.78)
+    y[0] = 0.0
+    return y
+
+
+def _measured_nit(n, seed=0):
+    return np.array([pq_eotf(v) for v in _measured_pq(n, seed)])
+
+
+def _plateau_curve(n, seed=0):
+    """带平坦区的非递减 PQ 曲线，用于 linear_interpolate_plateau_fix。"""
+    y = np.maximum.accumulate(_measured_pq(n, seed))
+    y[n // 3:n // 3 + max(2, n // 16)] = y[n // 3]
+    return np.maximum.accumulate(y)
+
+
+def _bench_measured_pq(n, target_len):
+    real = _measured_pq(n).tolist()
+    target = np.linspace(0, 1, target_len)
+    return lambda: generate_mhc2_lut_from_measured_pq(real, target)
+
+
+def _bench_measured_pq_batch(n, target_len):
+    real = np.stack([_measured_pq(n, s) for s in range(3)])
+    target = np.linspace(0, 1, target_len)
+    return lambda: generate_mhc2_lut_from_measured_pq_batch(real, target)
+
+
+def _bench_measure_data(n, eetf):
+    real = _measured_nit(n).tolist()
+    args = EETF_ARGS if eetf else None
+    return lambda: generate_mhc2_lut_from_measure_data(real, eetf_args=args)
+
+
+def _bench_eetf_from_lut(size, eetf):
+    lut = _plateau_curve(size)
+    args = EETF_ARGS if eetf else None
+    return lambda: eetf_from_lut(lut, args)
+
+
+def _bench_inversed_lut(size):
+    lut = _plateau_curve(size)
+    return lambda: generate_inversed_lut(lut)
+
+
+def _bench_linear_interpolate(n, target_len, plateau):
+    arr = _plateau_curve(n) if plateau else _measured_pq(n)
+    fn = linear_interpolate_plateau_fix if plateau else linear_interpolate
+    return lambda: fn(arr, target_len)
+
+
+def _bench_convert_transfer(size, fast):
+    v = np.linspace(0, 1, size)
+    return lambda: convert_transfer(v, ("pq", None), ("gamma", 2.2), 10000, 1000, fast=fast)
+
+
+def build_cases():
+    cases = {}
+    for n in MEASURED_POINTS:
+        cases[f"measured_pq/n={n}/len=4096"] = lambda n=n: _bench_measured_pq(n, 4096)
+        cases[f"measured_pq_batch/n={n}/len=4096"] = lambda n=n: _bench_measured_pq_batch(n, 4096)
+        for eetf in (False, True):
+            cases[f"measure_data/n={n}/eetf={int(eetf)}"] = \
+                lambda n=n, eetf=eetf: _bench_measure_data(n, eetf)
+        for plateau in (False, True):
+            name = "linear_interpolate_plateau_fix" if plateau else "linear_interpolate"
+            cases[f"{name}/n={n}/len=4096"] = \
+                lambda n=n, plateau=plateau: _bench_linear_interpolate(n, 4096, plateau)
+    for size in LUT_SIZES:
+        cases[f"measured_pq/n=33/len={size}"] = lambda size=size: _bench_measured_pq(33, size)
+        for eetf in (False, True):
+            cases[f"eetf_from_lut/len={size}/eetf={int(eetf)}"] = \
+                lambda size=size, eetf=eetf: _bench_eetf_from_lut(size, eetf)
+        cases[f"inversed_lut/len={size}"] = lambda size=size: _bench_inversed_lut(size)
+        for fast in (False, True):
+            cases[f"convert_transfer/len={size}/fast={int(fast)}"] = \
+                lambda size=size, fast=fast: _bench_convert_transfer(size, fast)
+    return cases
+
+
+CASES = build_cases()
+
+if __name__ == "__main__":
+    sys.exit(main(CASES, "lut"))
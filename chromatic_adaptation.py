@@ -0,0 +1,111 @@
+import numpy as np
+from functools import lru_cache
+from convert_utils import xyY_to_XYZ
+
+# 色适应 (von Kries 型) 变换：XYZ_dst = inv(M) @ diag(LMS_dst / LMS_src) @ M @ XYZ_src
+# 各方法的锥响应矩阵 M 及其逆在模块加载时计算一次，均为只读常量。
+
+CAT_METHODS = ("bradford", "cat02", "cat16", "von_kries")
+
+_CONE_MATRICES = {
+    "bradford": [
+        [0.8951, 0.2664, -0.1614],
+        [-0.7502, 1.7135, 0.0367],
+        [0.0389, -0.0685, 1.0296]
+    ],
+    "cat02": [
+        [0.7328, 0.4296, -0.1624],
+        [-0.7036, 1.6975, 0.0061],
+        [0.0030, 0.0136, 0.9834]
+    ],
+    "cat16": [
+        [0.401288, 0.650173, -0.051461],
+        [-0.250268, 1.204414, 0.045854],
+        [-0.002079, 0.048952, 0.953127]
+    ],
+    # Hunt-Pointer-Estévez（D65 归一化）
+    "von_kries": [
+        [0.4002, 0.7076, -0.0808],
+        [-0.2263, 1.1653, 0.0457],
+        [0.0, 0.0, 0.9182]
+    ],
+}
+
+
+def _freeze(m):
+    m.flags.writeable = False
+    return m
+
+
+CONE_MATRICES = {k: _freeze(np.array(v, dtype=float)) for k, v in _CONE_MATRICES.items()}
+CONE_MATRICES_INV = {k: _freeze(np.linalg.inv(v)) for k, v in CONE_MATRICES.items()}
+
+# 缓存键中 xy 保留的小数位数
+CACHE_XY_DECIMALS = 6
+
+
+def _cone(method):
+    try:
+        return CONE_MATRICES[method], CONE_MATRICES_INV[method]
+    except KeyError:
+        raise ValueError(f"method must be one of {CAT_METHODS}")
+
+
+def _xy_to_XYZ(xy):
+    """(..., 2) xy → (..., 3) XYZ，Y=1。"""
+    xy = np.asarray(xy, dtype=float)
+    if xy.shape[-1] != 2:
+        raise ValueError("last dim of xy must be 2")
+    Y = np.full(xy.shape[:-1] + (1,), 10000.0)
+    return xyY_to_XYZ(np.concatenate([xy, Y], axis=-1))
+
+
+def adaptation_matrices(xy_src, xy_dst, method="bradford"):
+    """
+    批量计算色适应矩阵。
+    xy_src / xy_dst: (2,) 或 (N, 2) 白点 xy，可互相广播
+    method: "bradford" / "cat02" / "cat16" / "von_kries"
+    返回: (N, 3, 3)（两者都是 (2,) 时为 (3, 3)），满足 XYZ_dst = M @ XYZ_src
+    """
+    M, M_inv = _cone(method)
+    lms_src = _xy_to_XYZ(xy_src) @ M.T
+    lms_dst = _xy_to_XYZ(xy_dst) @ M.T
+    # 防止除以零
+    lms_src = np.where(lms_src == 0, 1e-10, lms_src)
+    scale = lms_dst / lms_src
+    return (M_inv * scale[..., None, :]) @ M
+
+
+@lru_cache(maxsize=256)
+def _cached_matrix(xy_src, xy_dst, method):
+    return _freeze(adaptation_matrices(xy_src, xy_dst, method))
+
+
+def adaptation_matrix(xy_src, xy_dst, method="bradford", decimals=CACHE_XY_DECIMALS):
+    """
+    单个色适应矩阵 (3, 3)，按四舍五入到 decimals 位的 xy 做 LRU 缓存（返回只读数组）。
+    同一会话内重复使用的白点（如逐灰阶校正到同一目标白点）只计算一次。
+    """
+    key_src = tuple(round(float(v), decimals) for v in xy_src)
+    key_dst = tuple(round(float(v), decimals) for v in xy_dst)
+    if len(key_src) != 2 or len(key_dst) != 2:
+        raise ValueError("xy must have 2 components")
+    _cone(method)
+    return _cached_matrix(key_src, key_dst, method)
+
+
+def adaptation_cache_info():
+    return _cached_matrix.cache_info()
+
+
+def clear_adaptation_cache():
+    _cached_matrix.cache_clear()
+
+
+def adapt_XYZ(XYZ, xy_src, xy_dst, method="bradford"):
+    """
+    对 (..., 3) XYZ 做色适应。xy_src 可为 (N, 2)，与 XYZ 的 (N, 3) 逐行对应（每个样本各自的源白点）。
+    """
+    XYZ = np.asarray(XYZ, dtype=float)
+    m = adaptation_matrices(xy_src, xy_dst, method)
+    return (m @ XYZ[..., None])[..., 0]
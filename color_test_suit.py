@@ -57,8 +57,26 @@ def ymax_for_xy_with_M(M_device, xy, caps=(1.0, 1.0, 1.0), tol=1e-12):
     return float(max(0.0, Y_max))
 
 def ymax_for_many_with_M(M_device, xys, caps=(1.0, 1.0, 1.0), tol=1e-12):
-    """批量版本：xys 为 [(x1,y1), (x2,y2), ...]，返回 numpy.array([Ymax...])"""
-    return np.array([ymax_for_xy_with_M(M_device, xy, caps, tol) for xy in xys], dtype=float)
+    """批量版本：xys 为 [(x1,y1), (x2,y2), ...]，返回 numpy.array([Ymax...])，规则同 ymax_for_xy_with_M"""
+    Minv = np.linalg.inv(np.array(M_device, float))
+    xys = np.asarray(xys, dtype=float).reshape(-1, 2)
+    x, y = xys[:, 0], xys[:, 1]
+    ok = y > 0
+    safe_y = np.where(ok, y, 1.0)
+
+    # 每 1 nit 该色所需的设备线性 RGB
+    X_unit = np.column_stack([x / safe_y, np.ones_like(x), (1 - x - y) / safe_y])
+    r_perY = X_unit @ Minv.T
+
+    # 色域外（需要负通道）或没有正分量时为 0
+    pos = r_perY > tol
+    ok &= ~np.any(r_perY < -tol, axis=1) & np.any(pos, axis=1)
+
+    caps = np.broadcast_to(np.array(caps, float), (3,))
+    with np.errstate(divide="ignore"):
+        ratio = np.where(pos, caps / np.where(pos, r_perY, 1.0), np.inf)
+    Y_max = np.min(ratio, axis=1)
+    return np.where(ok, np.maximum(Y_max, 0.0), 0.0)
 
 
 def ymax_from_defined_primaries(xy_R, xy_G, xy_B, xy_W, xy, caps=(1.0,1.0,1.0)):
@@ -77,7 +95,7 @@ def ymax_many_from_defined_primaries(xy_R, xy_G, xy_B, xy_W, xys, caps=(1.0,1.0,
         M = build_rgb_to_xyz_from_primaries(xy_R, xy_G, xy_B, xy_W)
     except np.linalg.LinAlgError:
         return np.zeros(len(xys), dtype=float)
-    return np.array([ymax_for_xy_with_M(M, xy, caps) for xy in xys], dtype=float)
+    return ymax_for_many_with_M(M, xys, caps)
 
 # 人眼敏感色 
 sRGB_test_colors_xy = [
@@ -0,0 +1,197 @@
+import numpy as np
+from convert_utils import *
+from delteE import deltaE2000, XYZdeltaE_ITP
+from meta_data import D65_WHITE_POINT
+
+# 批量 / 流式 ΔE 报告：
+# - compute_delta_e 对一批 (目标, 实测) XYZ 一次性算出 ΔE ITP / ΔE2000 / ΔE76（ICtCp 与 Lab 各只转换一次）；
+# - DeltaEStats 以固定宽度直方图累积单个指标，count / mean / min / max 精确，
+#   百分位误差不超过一个分箱宽度，可 merge，适合分块与多线程；
+# - DeltaEReport 按色块或按批追加数据，随时可取汇总，不需要在全部历史上重算。
+
+DELTA_E_METRICS = ("itp", "2000", "76")
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+
+def _check_metrics(metrics):
+    for name in metrics:
+        if name not in DELTA_E_METRICS:
+            raise ValueError(f"metric must be one of {DELTA_E_METRICS}")
+    return tuple(metrics)
+
+
+def compute_delta_e(target_xyz, measured_xyz, metrics=DELTA_E_METRICS, context=None):
+    """
+    target_xyz / measured_xyz: (3,) 或 (N, 3) 归一化 XYZ（1 = 10000 nit）
+    metrics: "itp" / "2000" / "76" 的子集
+    context: ColorSpaceContext，Lab 的参考白；默认 D65、参考白 1000 nit（同 XYZdeltaE2000）
+    返回 {指标: (N,) ΔE}
+    """
+    _check_metrics(metrics)
+    target = np.asarray(target_xyz, dtype=float)
+    measured = np.asarray(measured_xyz, dtype=float)
+    if target.shape != measured.shape or target.shape[-1:] != (3,):
+        raise ValueError("target_xyz and measured_xyz must have the same (..., 3) shape")
+
+    res = {}
+    if "itp" in metrics:
+        res["itp"] = XYZdeltaE_ITP(target, measured)
+    if "2000" in metrics or "76" in metrics:
+        ctx = context or get_color_context(D65_WHITE_POINT, 1000)
+        lab_t = ctx.to_lab(target)
+        lab_m = ctx.to_lab(measured)
+        if "2000" in metrics:
+            res["2000"] = np.asarray(deltaE2000(lab_t, lab_m))
+        if "76" in metrics:
+            res["76"] = np.linalg.norm(lab_m - lab_t, axis=-1)
+    return {name: res[name] for name in metrics}
+
+
+class DeltaEStats:
+    """
+    单个 ΔE 指标的流式统计。
+    resolution: 直方图分箱宽度（ΔE），百分位误差上限
+    limit: 直方图上限，不小于 limit 的值（通常极少）原样保存，其百分位精确
+    nan 不计入统计，单独计数。
+    """
+
+    __slots__ = ("resolution", "limit", "count", "nan_count", "total", "min", "max", "_hist", "_over")
+
+    def __init__(self, resolution=0.01, limit=100.0):
+        if resolution <= 0 or limit <= 0:
+            raise ValueError("resolution and limit must be positive")
+        self.resolution = float(resolution)
+        self.limit = float(limit)
+        self.count = 0
+        self.nan_count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._hist = np.zeros(int(np.ceil(self.limit / self.resolution)), dtype=np.int64)
+        self._over = np.empty(0)
+
+    def update(self, values):
+        """追加任意形状的 ΔE 值。"""
+        v = np.asarray(values, dtype=float).ravel()
+        valid = ~np.isnan(v)
+        if not valid.all():
+            self.nan_count += int(v.size - np.count_nonzero(valid))
+            v = v[valid]
+        if v.size == 0:
+            return self
+        if v.min() < 0:
+            raise ValueError("delta E values must be non-negative")
+        self.count += v.size
+        self.total += float(v.sum())
+        self.min = min(self.min, float(v.min()))
+        self.max = max(self.max, float(v.max()))
+        over = v >= self.limit
+        if over.any():
+            self._over = np.sort(np.concatenate([self._over, v[over]]))
+            v = v[~over]
+        idx = np.minimum((v * (1.0 / self.resolution)).astype(np.intp), self._hist.size - 1)
+        self._hist += np.bincount(idx, minlength=self._hist.size)
+        return self
+
+    def merge(self, other):
+        """合并另一个同参数的 DeltaEStats（分块 / 多线程结果汇总）。"""
+        if (other.resolution, other.limit) != (self.resolution, self.limit):
+            raise ValueError("cannot merge DeltaEStats with different resolution / limit")
+        self.count += other.count
+        self.nan_count += other.nan_count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._hist += other._hist
+        if other._over.size:
+            self._over = np.sort(np.concatenate([self._over, other._over]))
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float("nan")
+
+    def _order_stat(self, k):
+        """第 k 小（0 起）样本值的估计：在所在分箱内按秩均匀分布；最小 / 最大值与溢出值精确。"""
+        cum = np.cumsum(self._hist)
+        n_hist = cum[-1]
+        i = np.minimum(np.searchsorted(cum, k, side="right"), self._hist.size - 1)
+        before = np.where(i > 0, cum[np.maximum(i - 1, 0)], 0)
+        frac = (k - before + 0.5) / np.maximum(self._hist[i], 1)
+        v = np.clip((i + frac) * self.resolution, self.min, self.max)
+        if self._over.size:
+            v = np.where(k >= n_hist, self._over[np.clip(k - n_hist, 0, self._over.size - 1)], v)
+        v = np.where(k == 0, self.min, v)
+        return np.where(k == self.count - 1, self.max, v)
+
+    def percentile(self, q):
+        """q: 0..100，可为序列；与 np.percentile 默认的线性插值定义一致，误差 <= resolution。无数据时返回 nan。"""
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 100)):
+            raise ValueError("percentile must be within [0, 100]")
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+        r = q / 100.0 * (self.count - 1)
+        k = np.floor(r).astype(np.int64)
+        t = r - k
+        k1 = np.minimum(k + 1, self.count - 1)
+        return (self._order_stat(k) * (1 - t) + self._order_stat(k1) * t)[()]
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """{"count", "mean", "min", "max", "p50", ...}，无数据时数值为 nan。"""
+        empty = self.count == 0
+        res = {
+            "count": self.count,
+            "mean": self.mean,
+            "min": float("nan") if empty else self.min,
+            "max": float("nan") if empty else self.max,
+        }
+        for q, v in zip(percentiles, np.atleast_1d(self.percentile(percentiles))):
+            res[f"p{q:g}"] = float(v)
+        return res
+
+
+class DeltaEReport:
+    """
+    目标 / 实测 XYZ 的 ΔE 报告，可逐个色块（测量回调中）或整批追加。
+    metrics: 统计的指标，见 DELTA_E_METRICS
+    context: Lab 参考白，见 compute_delta_e
+    keep_samples: 是否保留每个样本的目标、实测与 ΔE（用于日志 / 导出）；长流可关闭只保留统计
+    resolution / limit: 传给各指标的 DeltaEStats
+    """
+
+    def __init__(self, metrics=DELTA_E_METRICS, context=None, keep_samples=True,
+                 resolution=0.01, limit=100.0):
+        self.metrics = _check_metrics(metrics)
+        self.context = context
+        self.keep_samples = keep_samples
+        self.stats = {name: DeltaEStats(resolution, limit) for name in self.metrics}
+        self._samples = []
+
+    def add(self, target_xyz, measured_xyz, mask=None):
+        """
+        追加一个 (3,) 色块或一批 (N, 3) 色块，返回本批的 {指标: (N,) ΔE}。
+        mask: 可选 (N,) bool，只有为 True 的样本计入统计（返回值仍包含全部样本）
+        """
+        target = np.atleast_2d(np.asarray(target_xyz, dtype=float))
+        measured = np.atleast_2d(np.asarray(measured_xyz, dtype=float))
+        de = compute_delta_e(target, measured, self.metrics, self.context)
+        keep = slice(None) if mask is None else np.asarray(mask, dtype=bool)
+        for name in self.metrics:
+            self.stats[name].update(de[name][keep])
+        if self.keep_samples:
+            self._samples.append((target[keep], measured[keep], {k: v[keep] for k, v in de.items()}))
+        return de
+
+    def samples(self):
+        """已保留的样本：(target (N,3), measured (N,3), {指标: (N,)})；keep_samples=False 时为空。"""
+        if not self._samples:
+            return np.empty((0, 3)), np.empty((0, 3)), {name: np.empty(0) for name in self.metrics}
+        target = np.concatenate([s[0] for s in self._samples])
+        measured = np.concatenate([s[1] for s in self._samples])
+        de = {name: np.concatenate([s[2][name] for s in self._samples]) for name in self.metrics}
+        return target, measured, de
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """{指标: DeltaEStats.summary()}。"""
+        return {name: self.stats[name].summary(percentiles) for name in self.metrics}
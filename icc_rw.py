@@ -1,5 +1,6 @@
 import struct
 import numpy as np
+from lut1d import Lut1D
 class ICCProfile:
     def __init__(self, path):
         with open(path, 'rb') as f:
@@ -290,10 +291,8 @@ class ICCProfile:
         def read_lut(offset):
             if offset == 0: return None
             if block[offset:offset+4] != b'sf32': return None
-            return [
-                self._decode_s15fixed16(block[offset+8+i:offset+12+i])
-                for i in range(0, count*4, 4)
-            ]
+            raw = np.frombuffer(block, dtype='>i4', count=count, offset=offset+8)
+            return Lut1D(raw / 65536.0, copy=False)
 
         matrix = None
         if matrix_offset:
@@ -345,13 +344,19 @@ class ICCProfile:
                 block += b'\x00' * (4 - len(block) % 4)
 
         def write_lut(name, lut, block):
-            if not lut:
+            # lut: list / ndarray / Lut1D
+            if lut is None or len(lut) == 0:
                 return
             pos = len(block)
             sub_blocks[name] = pos
             block.extend(b'sf32' + b'\x00\x00\x00\x00')
-            for v in lut:
-                block += self._encode_s15fixed16(v)
+            values = np.asarray(lut, dtype=np.float64)
+            fixed = np.round(values * 65536)
+            if not np.isfinite(fixed).all():
+                raise ValueError(f"{name} LUT contains non-finite values")
+            if fixed.min() < -2**31 or fixed.max() > 2**31 - 1:
+                raise ValueError(f"{name} LUT values out of s15Fixed16 range")
+            block += fixed.astype('>i4').tobytes()
             if len(block) % 4 != 0:
                 block += b'\x00' * (4 - len(block) % 4)
 
@@ -1,11 +1,15 @@
 from convert_utils import *
+from lut1d import Lut1D, Lut1D3, KnotLut1D, invert_monotone_curve, _pchip_slopes
 import numpy as np
 import copy
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 
 
 
 def convert_transfer(v, src=("gamma", 2.2), dst=("srgb", None),
-                     src_peak_nit: float = 10000, dst_peak_nit: float = 10000):
+                     src_peak_nit: float = 10000, dst_peak_nit: float = 10000, fast: bool = False):
     """
     在 gammaX、sRGB、PQ 之间任意互转（向量化，支持标量或 ndarray）。
     参数:
@@ -14,20 +18,25 @@ def convert_transfer(v, src=("gamma", 2.2), dst=("srgb", None),
       - dst: 目标类型与参数，同上
       - src_peak_nit: 源为 PQ 时，用于将绝对亮度归一化为相对亮度的峰值
       - dst_peak_nit: 目标为 PQ 时，用于将相对亮度扩展为绝对亮度的峰值
+      - fast: True 时走缓存的高分辨率转换表 + 线性插值（见 transfer_table），
+              误差上限为该表的 max_error；False 时总以 float64 解析公式计算，
+              不受 PQ_FAST / FLOAT_DTYPE 全局设置影响（转换表由此构建，缓存结果与设置无关）
     返回:
       - 与 v 同形状的目标码值(0..1)
     """
+    if fast:
+        return transfer_table(src, dst, src_peak_nit, dst_peak_nit).lookup(v)
     v = np.asarray(v, dtype=np.float64)
 
     # 1) 源 -> 线性相对亮度 L_rel ∈ [0,1]
     st, sp = src
     st = (st or "").lower()
     if st == "gamma":
-        L_rel = gamma_decode(v, float(sp))
+        L_rel = gamma_decode(v, float(sp), dtype=np.float64)
     elif st == "srgb":
-        L_rel = srgb_decode(v)
+        L_rel = srgb_decode(v, dtype=np.float64)
     elif st == "pq":
-        L_abs = pq_oetf(v)  # cd/m²
+        L_abs = pq_oetf(v, fast=False, dtype=np.float64)  # cd/m²
         L_rel = np.clip(L_abs / max(float(src_peak_nit), 1e-12), 0.0, 1.0)
     else:
         raise ValueError(f"未知源类型: {st}（应为 'gamma'|'srgb'|'pq'）")
@@ -36,54 +45,192 @@ def convert_transfer(v, src=("gamma", 2.2), dst=("srgb", None),
     dt, dp = dst
     dt = (dt or "").lower()
     if dt == "gamma":
-        out = gamma_encode(L_rel, float(dp))
+        out = gamma_encode(L_rel, float(dp), dtype=np.float64)
     elif dt == "srgb":
-        out = srgb_encode(L_rel)
+        out = srgb_encode(L_rel, dtype=np.float64)
     elif dt == "pq":
         L_abs_t = np.clip(L_rel, 0.0, 1.0) * max(float(dst_peak_nit), 1e-12)
-        out = pq_eotf(L_abs_t)
+        out = pq_eotf(L_abs_t, fast=False, dtype=np.float64)
     else:
         raise ValueError(f"未知目标类型: {dt}（应为 'gamma'|'srgb'|'pq'）")
 
     return np.clip(out, 0.0, 1.0)
 
 
-def bt2390eetf(V: float, Lb: float, Lw: float, Lmin: float, Lmax: float) -> float:
+# ---------------- 转换表缓存 ----------------
+# convert_transfer 的 (src, dst, src_peak_nit, dst_peak_nit) 组合很少且反复出现，
+# 预先在 [0,1] 上均匀采样 TRANSFER_TABLE_SIZE 个点，之后的转换只做查表插值。
+TRANSFER_TABLE_SIZE = 65537
+TRANSFER_TABLE_CACHE_SIZE = 32
+_transfer_table_cache = OrderedDict()
+_transfer_table_lock = threading.Lock()
+
+
+class TransferTable:
+    """
+    convert_transfer 的预计算查表。
+      - values: 只读 ndarray，values[i] = convert_transfer(i/(size-1), ...)
+      - max_error: 建表时在每个区间内按 1/8 步长实测的 |查表插值 - 解析值| 最大值。
+        对 gamma/sRGB/PQ 这类分段光滑单调曲线，区间内误差极值点靠近这些采样位置，
+        真实上限一般在 max_error 的 1.2 倍以内；默认 65537 点时
+        x >= 1e-3 处一般 < 1e-7，整体误差由 0 附近 gamma 曲线导数发散决定
+        （如 gamma 2.2 -> sRGB 约 1.4e-4）。
+    """
+    __slots__ = ("key", "values", "slopes", "max_error")
+
+    def __init__(self, key, values, max_error):
+        self.key = key
+        self.values = values
+        self.slopes = np.diff(values)
+        self.max_error = max_error
+
+    def lookup(self, v):
         """
-        BT.2390 EETF
-        对 PQ 信号 V 根据黑场/白场限制进行电子-电子传递函数调整。
-        Lb, Lw: 参考黑场和白场亮度(0-10000 nit)
-        Lmin, Lmax: 目标显示的黑场和白场亮度(0-10000 nit)
-        返回调整后的PQ信号值。
+        对输入码值 v (0..1) 做均匀网格线性插值，返回与 v 同形状的结果。
+        nan 输入输出 nan（与解析路径一致）；超出 [0,1] 的输入（含 ±inf）按裁剪处理。
         """
-        # 将输入PQ值规范化为 EETF 空间 [0,1]
-        Vb = pq_oetf(Lb)
-        Vw = pq_oetf(Lw)
-        E1 = (V - Vb) / (Vw - Vb)
-        # 计算目标显示的归一化最小/最大亮度值
-        minLum = (pq_oetf(Lmin) - Vb) / (Vw - Vb)
-        maxLum = (pq_oetf(Lmax) - Vb) / (Vw - Vb)
-        # 膝点和黑场参数:contentReference[oaicite:35]{index=35}
-        KS = 1.5 * maxLum - 0.5
-        b = minLum
-        # 定义 Hermite 样条辅助函数
-        T = lambda A: (A - KS) / (1 - KS) if KS != 1 else 0.0
-        P = lambda B: (2 * T(B)**3 - 3 * T(B)**2 + 1) * KS \
-                    + (T(B)**3 - 2 * T(B)**2 + T(B)) * (1 - KS) \
-                    + (-2 * T(B)**3 + 3 * T(B)**2) * maxLum
-        # 按照 BT.2390 Step 3.1 & 3.2 计算 E2, E3
-        if E1 < KS:
-            E2 = E1
-        elif KS <= E1 <= 1:
-            E2 = P(E1)
-        else:
-            E2 = E1  # 万一 E1>1（理应不会），则不改变
-        E3 = E2
-        if 0 <= E2 <= 1:
-            E3 = E2 + b * (1 - E2) ** 4  # 黑场提升
-        # 反规范化回 PQ 信号
-        E4 = E3 * (Vw - Vb) + Vb
-        return E4
+        last = self.values.size - 1
+        v = np.asarray(v, dtype=np.float64)
+        nan = np.isnan(v)
+        x = np.clip(v, 0.0, 1.0, out=np.empty_like(v))
+        has_nan = nan.any()
+        if has_nan:
+            x[nan] = 0.0
+        x *= last
+        i = x.astype(np.intp)
+        np.minimum(i, last - 1, out=i)
+        x -= i
+        x *= self.slopes.take(i)
+        x += self.values.take(i)
+        if has_nan:
+            x[nan] = np.nan
+        return x if x.ndim else x[()]
+
+
+def _transfer_key(src, dst, src_peak_nit, dst_peak_nit):
+    st, sp = src
+    dt, dp = dst
+    st = (st or "").lower()
+    dt = (dt or "").lower()
+    # 峰值只对 PQ 端有意义，归一化后提高命中率
+    return (st, None if sp is None else float(sp),
+            dt, None if dp is None else float(dp),
+            float(src_peak_nit) if st == "pq" else None,
+            float(dst_peak_nit) if dt == "pq" else None)
+
+
+def transfer_table(src=("gamma", 2.2), dst=("srgb", None),
+                   src_peak_nit: float = 10000, dst_peak_nit: float = 10000):
+    """
+    取得（必要时构建并缓存）convert_transfer 的转换表，参数同 convert_transfer。
+    缓存为 LRU，最多保留 TRANSFER_TABLE_CACHE_SIZE 张表。
+    返回 TransferTable。
+    """
+    key = _transfer_key(src, dst, src_peak_nit, dst_peak_nit)
+    with _transfer_table_lock:
+        table = _transfer_table_cache.get(key)
+        if table is not None:
+            _transfer_table_cache.move_to_end(key)
+            return table
+
+    st, sp, dt, dp, speak, dpeak = key
+    args = ((st, sp), (dt, dp), 10000 if speak is None else speak, 10000 if dpeak is None else dpeak)
+    x = np.linspace(0, 1, TRANSFER_TABLE_SIZE)
+    values = convert_transfer(x, *args)
+    values.flags.writeable = False
+    max_error = 0.0
+    for w in np.arange(1, 8) / 8:
+        probe = convert_transfer(x[:-1] + w * (x[1:] - x[:-1]), *args)
+        interp = values[:-1] + w * (values[1:] - values[:-1])
+        max_error = max(max_error, float(np.max(np.abs(interp - probe))))
+    table = TransferTable(key, values, max_error)
+
+    with _transfer_table_lock:
+        _transfer_table_cache[key] = table
+        _transfer_table_cache.move_to_end(key)
+        while len(_transfer_table_cache) > TRANSFER_TABLE_CACHE_SIZE:
+            _transfer_table_cache.popitem(last=False)
+    return table
+
+
+def transfer_table_cache_info():
+    """
+    返回当前缓存的转换表信息（按最近使用从旧到新）:
+      [{"src": (type, param), "dst": (type, param), "src_peak_nit", "dst_peak_nit", "size", "max_error"}, ...]
+    """
+    with _transfer_table_lock:
+        tables = list(_transfer_table_cache.values())
+    return [{"src": t.key[0:2], "dst": t.key[2:4],
+             "src_peak_nit": t.key[4], "dst_peak_nit": t.key[5],
+             "size": t.values.size, "max_error": t.max_error} for t in tables]
+
+
+def clear_transfer_table_cache():
+    with _transfer_table_lock:
+        _transfer_table_cache.clear()
+
+
+@lru_cache(maxsize=64)
+def bt2390eetf_params(Lb: float, Lw: float, Lmin: float, Lmax: float):
+    """
+    BT.2390 EETF 膝点/黑场参数，按 (Lb, Lw, Lmin, Lmax) 缓存，只计算一次。
+    总以 float64 解析 PQ 计算，缓存结果不受 PQ_FAST / FLOAT_DTYPE 全局设置影响。
+    返回 (Vb, Vw, KS, b, maxLum):
+      - Vb, Vw: 参考黑/白场的 PQ 值
+      - KS: 膝点（归一化 EETF 空间）
+      - b: 黑场提升量 (minLum)
+      - maxLum: 目标显示归一化峰值
+    """
+    Vb = pq_oetf(Lb, fast=False, dtype=np.float64)
+    Vw = pq_oetf(Lw, fast=False, dtype=np.float64)
+    minLum = (pq_oetf(Lmin, fast=False, dtype=np.float64) - Vb) / (Vw - Vb)
+    maxLum = (pq_oetf(Lmax, fast=False, dtype=np.float64) - Vb) / (Vw - Vb)
+    KS = 1.5 * maxLum - 0.5
+    b = minLum
+    return Vb, Vw, KS, b, maxLum
+
+
+def bt2390eetf(V: float, Lb: float, Lw: float, Lmin: float, Lmax: float) -> float:
+    """
+    BT.2390 EETF
+    对 PQ 信号 V 根据黑场/白场限制进行电子-电子传递函数调整。
+    Lb, Lw: 参考黑场和白场亮度(0-10000 nit)
+    Lmin, Lmax: 目标显示的黑场和白场亮度(0-10000 nit)
+    返回调整后的PQ信号值。
+    标量入口，与 bt2390eetf_array 共用同一实现，逐点结果与整条 ramp 完全一致。
+    """
+    return bt2390eetf_array(V, Lb, Lw, Lmin, Lmax)[()]
+
+
+def bt2390eetf_array(V, Lb: float, Lw: float, Lmin: float, Lmax: float):
+    """
+    BT.2390 EETF 的向量化版本：一次 NumPy 计算处理整条 PQ ramp。
+    参数与 bt2390eetf 相同，V 可为标量或 ndarray；参数只按 (Lb, Lw, Lmin, Lmax) 计算一次。
+    返回与 V 同形状的 PQ 信号 (float64)。
+    """
+    V = np.asarray(V, dtype=np.float64)
+    # 膝点和黑场参数:contentReference[oaicite:35]{index=35}
+    Vb, Vw, KS, b, maxLum = bt2390eetf_params(Lb, Lw, Lmin, Lmax)
+    # 将输入PQ值规范化为 EETF 空间 [0,1]
+    E1 = (V - Vb) / (Vw - Vb)
+    # Hermite 样条 (Step 3.1)，仅在 KS <= E1 <= 1 区间生效
+    # 幂次用乘法展开，避免 pow 的标量/SIMD 实现差异
+    if KS != 1:
+        T = (E1 - KS) / (1 - KS)
+    else:
+        T = np.zeros_like(E1)
+    T2 = T * T
+    T3 = T2 * T
+    P = (2 * T3 - 3 * T2 + 1) * KS \
+        + (T3 - 2 * T2 + T) * (1 - KS) \
+        + (-2 * T3 + 3 * T2) * maxLum
+    E2 = np.where((E1 >= KS) & (E1 <= 1), P, E1)
+    # 黑场提升 (Step 3.2)，E1>1 或 E2 越界时保持不变
+    U2 = (1 - E2) * (1 - E2)
+    E3 = np.where((E2 >= 0) & (E2 <= 1), E2 + b * (U2 * U2), E2)
+    # 反规范化回 PQ 信号
+    return E3 * (Vw - Vb) + Vb
+
 
 def find_nearest_idx(arr, value):
     """
@@ -99,34 +246,52 @@ def max_uniform_target(n, limit=4096):
     k = (limit - n) // (n - 1)
     return n + k * (n - 1), k
 
+def _segment_counts(n_points, target_len):
+    """
+    每段输出的点数（起点 + 插入点，不含终点），余数依次分配给前面的若干段。
+    """
+    intervals = n_points - 1
+    total_insert = target_len - n_points
+    base = total_insert // intervals
+    remainder = total_insert % intervals  # 前 remainder 段每段多插 1 个
+    counts = np.full(intervals, base + 1, dtype=np.intp)
+    counts[:remainder] += 1
+    return counts
+
+def _fill_segments(starts, ends, counts, last):
+    """
+    一次性生成所有段的插值点，逐段结果与 np.linspace(start, end, count + 1)[:-1] 逐位一致。
+    starts/ends: 每段端点；counts: 每段输出点数；last: 最终追加的端点。
+    """
+    total = int(counts.sum())
+    out = np.empty(total + 1, dtype=float)
+    seg = np.repeat(np.arange(counts.size), counts)
+    offsets = np.cumsum(counts) - counts
+    k = (np.arange(total) - offsets[seg]).astype(float)
+    div = counts[seg].astype(float)
+    start = starts[seg]
+    delta = ends[seg] - start
+    step = delta / div
+    # 与 linspace 相同：步长为 0 时改用 k/div*delta
+    zero = step == 0
+    out[:total] = np.where(zero, k / div * delta, k * step) + start
+    out[total] = last
+    return out
+
 def linear_interpolate(arr, target_len):
     """
     线性插值扩展数组到指定长度，每两个数字之间插入的数量相等
     arr: 原数组 (1D)
     target_len: 目标长度 (>= len(arr))
+    余数依次分配给前面的若干段；向量化实现，结果与逐段 np.linspace 拼接逐位一致。
     """
     arr = np.asarray(arr, dtype=float)
     n_points = len(arr)
     if target_len <= n_points:
         return arr
 
-    # 每段插入的点数（不包括端点）
-    intervals = n_points - 1
-    total_insert = target_len - n_points
-    insert_per_interval = total_insert // intervals
-    remainder = total_insert % intervals
-
-    result = []
-    for i in range(intervals):
-        start = arr[i]
-        end = arr[i+1]
-        # 当前段插值数量，分配余数
-        n_insert = insert_per_interval + (1 if i < remainder else 0)
-        # 当前段的插值（包括起点，不包括终点）
-        segment = np.linspace(start, end, n_insert + 2)[:-1]
-        result.extend(segment)
-    result.append(arr[-1])
-    return np.array(result)
+    counts = _segment_counts(n_points, target_len)
+    return _fill_segments(arr[:-1], arr[1:], counts, arr[-1])
 
 def linear_interpolate_plateau_fix(arr, target_len):
     """
@@ -138,6 +303,7 @@ def linear_interpolate_plateau_fix(arr, target_len):
          则把这整段平坦区 + 紧随的那个不同值视作一个“大区间”做线性拆分。
          平坦区内部各原始间隔被赋予逐步递增(或递减)的子区间端点，避免重复值导致插值退化。
          若平坦区位于末尾(后面没有不同值)，保持原样。
+    向量化实现，平坦区识别与拆分方式与逐段循环版本逐位一致。
     """
     arr = np.asarray(arr, dtype=float)
     n_points = len(arr)
@@ -145,75 +311,129 @@ def linear_interpolate_plateau_fix(arr, target_len):
         return arr.copy()
 
     intervals = n_points - 1
-    total_insert = target_len - n_points
-    base = total_insert // intervals
-    remainder = total_insert % intervals  # 前 remainder 段每段多插 1 个
-
-    # 预计算每段需要插入的点数
-    inserts_per_interval = [base + (1 if i < remainder else 0) for i in range(intervals)]
+    counts = _segment_counts(n_points, target_len)
 
     # 计算“有效”区间端点(处理平坦区)
     # 默认 start/end 就是相邻值
-    effective_starts = np.empty(intervals, dtype=float)
-    effective_ends = np.empty(intervals, dtype=float)
-
-    i = 0
-    while i < intervals:
-        v0 = arr[i]
-        v1 = arr[i + 1]
-        if v0 != v1:
-            # 普通区间
-            effective_starts[i] = v0
-            effective_ends[i] = v1
-            i += 1
-            continue
-
-        # 平坦区开始 (arr[i] == arr[i+1])
-        plateau_start = i
-        # 扩展直到值改变或到末尾
-        j = i + 1
-        while j < n_points and arr[j] == v0:
-            j += 1
-        # 现在 plateau 索引范围 [plateau_start, j-1] (值都等于 v0)
-        # 下一个不同值位置 j (如果 j < n_points)，对应的值 arr[j]
-        if j < n_points:
-            # 存在后续不同值，拆分为 (j - plateau_start) 个子区间
-            plateau_intervals = j - plateau_start
-            v_next = arr[j]
-            # 在 v0 -> v_next 之间线性划分 plateau_intervals 份
-            for k in range(plateau_intervals):
-                idx = plateau_start + k
-                t0 = k / plateau_intervals
-                t1 = (k + 1) / plateau_intervals
-                effective_starts[idx] = v0 + (v_next - v0) * t0
-                effective_ends[idx] = v0 + (v_next - v0) * t1
-            i = plateau_start + plateau_intervals
-        else:
-            # 平坦区到末尾(没有不同值)，保持原样
-            for idx in range(plateau_start, intervals):
-                effective_starts[idx] = arr[idx]
-                effective_ends[idx] = arr[idx + 1]
-            break  # 已到末尾
-
-    # 生成结果
-    result = []
-    for idx in range(intervals):
-        start = effective_starts[idx]
-        end = effective_ends[idx]
-        n_insert = inserts_per_interval[idx]
-        # 该段需要输出: 起点 + n_insert 个内点 (不含终点，终点在下一段或最后统一追加)
-        if n_insert == 0:
-            # 只放起点
-            result.append(start)
-        else:
-            segment = np.linspace(start, end, n_insert + 2)[:-1]  # 去掉终点
-            result.extend(segment)
-
-    # 最后追加最终端点
-    result.append(arr[-1])
-    return np.array(result, dtype=float)
+    effective_starts = arr[:-1].copy()
+    effective_ends = arr[1:].copy()
+
+    # 平坦区 = 长度 >= 2 的最长相等值段；按点求所在段的起点 p 与终点 e
+    pos = np.arange(n_points)
+    eq = arr[:-1] == arr[1:]
+    run_first = np.ones(n_points, dtype=bool)
+    run_first[1:] = ~eq
+    run_last = np.ones(n_points, dtype=bool)
+    run_last[:-1] = ~eq
+    p = np.maximum.accumulate(np.where(run_first, pos, 0))
+    e = np.minimum.accumulate(np.where(run_last, pos, n_points - 1)[::-1])[::-1]
+
+    # 区间 idx 的起点位于非末尾平坦区内：在 v0 -> v_next 之间等分 (j - p) 份，j = e + 1
+    idx = pos[:intervals]
+    p_i = p[:intervals]
+    j_i = e[:intervals] + 1
+    split = (j_i - p_i >= 2) & (j_i < n_points)
+    if np.any(split):
+        idx = idx[split]
+        p_i = p_i[split]
+        j_i = j_i[split]
+        plateau_intervals = j_i - p_i
+        k = idx - p_i
+        v0 = arr[p_i]
+        v_next = arr[j_i]
+        t0 = k / plateau_intervals
+        t1 = (k + 1) / plateau_intervals
+        effective_starts[idx] = v0 + (v_next - v0) * t0
+        effective_ends[idx] = v0 + (v_next - v0) * t1
+
+    # 生成结果，最后追加最终端点
+    return _fill_segments(effective_starts, effective_ends, counts, arr[-1])
+
+def isotonic_regression(y, w=None):
+    """
+    单调非递减的保序回归 (Pool Adjacent Violators)。
+    y: 1D 测量值
+    w: 每个点的权重（可选，默认全 1）
+    返回:
+      与 y 等长的 ndarray，为加权平方误差最小的非递减序列。
+      与逐点 max 截断不同，噪声向下的点会与前面的点取平均，不会把噪声“抬平”到后面。
+    """
+    y = np.asarray(y, dtype=float).ravel()
+    w = np.ones_like(y) if w is None else np.asarray(w, dtype=float).ravel()
+    if w.shape != y.shape:
+        raise ValueError("weights length mismatch")
+    vals, wts, cnts = [], [], []
+    for yi, wi in zip(y.tolist(), w.tolist()):
+        vals.append(yi)
+        wts.append(wi)
+        cnts.append(1)
+        # 与前一块冲突则合并为加权平均
+        while len(vals) > 1 and vals[-2] > vals[-1]:
+            wsum = wts[-2] + wts[-1]
+            vals[-2] = (vals[-2] * wts[-2] + vals[-1] * wts[-1]) / wsum
+            wts[-2] = wsum
+            cnts[-2] += cnts[-1]
+            del vals[-1], wts[-1], cnts[-1]
+    return np.repeat(vals, cnts)
+
+def pchip_interpolate(x, y, xq):
+    """
+    单调保形分段三次插值 (PCHIP)。
+    x: 严格递增的节点；y: 节点值；xq: 查询点（超出范围时钳位到端点）
+    y 单调时结果单调，且不会产生过冲。
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    if x.size < 2 or x.shape != y.shape:
+        raise ValueError("x/y must be 1D with the same length >= 2")
+    if np.any(np.diff(x) <= 0):
+        raise ValueError("x must be strictly increasing")
+    d = _pchip_slopes(x, y)
+
+    xq = np.clip(np.asarray(xq, dtype=float), x[0], x[-1])
+    k = np.clip(np.searchsorted(x, xq, side="right") - 1, 0, x.size - 2)
+    h = x[k + 1] - x[k]
+    t = (xq - x[k]) / h
+    t2 = t * t
+    t3 = t2 * t
+    h00 = 2 * t3 - 3 * t2 + 1
+    h10 = t3 - 2 * t2 + t
+    h01 = -2 * t3 + 3 * t2
+    h11 = t3 - t2
+    return h00 * y[k] + h10 * h * d[k] + h01 * y[k + 1] + h11 * h * d[k + 1]
+
+def fit_monotone_curve(y, x=None, target_len=4096, w=None):
+    """
+    稀疏灰阶测量 -> 平滑单调稠密曲线：保序回归去噪后做 PCHIP 插值。
+    y: 测量值（如各灰阶实测 PQ），按输入从暗到亮
+    x: 对应输入位置 [0,1]，默认均匀分布
+    target_len: 输出曲线长度（在 [0,1] 上均匀采样）
+    w: 每个测量点的权重（可选）
+    返回:
+      (curve, residuals)
+      - curve: shape=(target_len,) 非递减曲线
+      - residuals: 每个测量点 y - curve(x)，用于判断拟合质量与坏点
+    """
+    y = np.asarray(y, dtype=float).ravel()
+    n = y.size
+    if n < 2:
+        raise ValueError("need at least 2 measured points")
+    x = np.linspace(0, 1, n) if x is None else np.asarray(x, dtype=float).ravel()
+    if x.shape != y.shape:
+        raise ValueError("x/y length mismatch")
+    y_iso = isotonic_regression(y, w)
+    # 保序回归产生的平坦块在 PCHIP 中自然保持为平坦段
+    curve = pchip_interpolate(x, y_iso, np.linspace(0, 1, target_len))
+    residuals = y - pchip_interpolate(x, y_iso, x)
+    return curve, residuals
 
 def lut_scale(pq_values, scale):
+    """
+    LUT 输出整体缩放并裁剪到 [0,1]。
+    pq_values: 标量 / list / ndarray / Lut1D；传入 Lut1D 时返回 Lut1D，否则返回新的 ndarray。
+    """
+    if isinstance(pq_values, Lut1D):
+        return pq_values.scale(scale)
     scale = float(scale)
     if scale <= 0:
         raise ValueError("scale 必须 > 0")
@@ -226,43 +446,30 @@ def generate_pq_lut(target_len=4096):
     return np.linspace(0, 1, target_len)
 
 def generate_inversed_lut(lut):
+    """
+    求 [0,1]->[0,1] 单调非递减 LUT 的反查表（长度相同）。
+    已知点一次 scatter 写入（同一格子由多个输入命中时取最后一个），
+    其余格子在相邻已知点之间线性插值，两端之外保持端点值。
+    """
     a = np.asarray(lut, dtype=float).ravel()
     if a.size < 2:
         raise ValueError("lut length must be >= 2")
+    if np.any(np.diff(a) < 0):
+        raise ValueError("lut must be non-decreasing to generate inversed lut")
     L = a.size - 1
-    out = np.full(L + 1, np.nan, dtype=float)
-    
-    for i, y in enumerate(a):
-        j = int(round(y * L))
-        j = 0 if j < 0 else (L if j > L else j)
-        out[j] = i / L
-    
-    nan_mask = np.isnan(out)
-    if np.all(nan_mask):
-        raise ValueError("generate reserverd lut failed: all values are NaN")
-    
-    # fallback linear interpolation for NaN positions
-    pos = np.arange(L + 1)
-    known_idx = pos[~nan_mask]
-    known_val = out[~nan_mask]
-    insert_pos = pos  
-    j = np.searchsorted(known_idx, insert_pos, side="left")
-
-    left_exist = j > 0
-    left_idx = np.where(left_exist, known_idx[j - 1], -1)
-    left_val = np.where(left_exist, known_val[j - 1], np.nan)
-    dl = np.where(left_exist, insert_pos - left_idx, np.inf)
-
-    right_exist = j < known_idx.size
-    right_idx = np.where(right_exist, known_idx[j], -1)
-    right_val = np.where(right_exist, known_val[j], np.nan)
-    dr = np.where(right_exist, right_idx - insert_pos, np.inf)
-
-    choose_left = dl <= dr
-    filled = np.where(choose_left, left_val, right_val)
-
-    out[nan_mask] = filled[nan_mask]
 
+    j = np.clip(np.rint(a * L), 0, L).astype(np.intp)
+    # j 单调非递减，每个格子保留最后一个命中的输入
+    last = np.empty(j.size, dtype=bool)
+    last[:-1] = j[1:] != j[:-1]
+    last[-1] = True
+    known_idx = j[last]
+    known_val = np.flatnonzero(last) / L
+
+    out = np.empty(L + 1, dtype=float)
+    out[known_idx] = known_val
+    if known_idx.size < L + 1:
+        out = np.interp(np.arange(L + 1), known_idx, known_val)
     return out
 
 def generate_bright_pq_lut(target_len=4096):
@@ -321,84 +528,100 @@ def generate_mhc2_lut_from_measure_data(real_nit, target_pq=None, max_nit=10000,
         target_pq = np.array(target_pq, dtype=float)
     # target_pq = np.clip(target_pq*1.1, 0.0, 1.0)
     if eetf_args:
-        target_pq_eetf = []
         lt = len(target_pq)
-        for idx in range(lt):
-            V = idx/(lt-1)
-            Lb = eetf_args["source_min"]
-            Lw = eetf_args["source_max"]
-            Lmin = eetf_args["monitor_min"]
-            Lmax = eetf_args["monitor_max"]
-            NV_index = int(round(float(bt2390eetf(V, Lb, Lw, Lmin, Lmax))*(lt-1)))
-            NV = target_pq[NV_index]
-            target_pq_eetf.append(NV)
-        target_pq = np.array(target_pq_eetf)
+        V = np.arange(lt) / (lt-1)
+        Lb = eetf_args["source_min"]
+        Lw = eetf_args["source_max"]
+        Lmin = eetf_args["monitor_min"]
+        Lmax = eetf_args["monitor_max"]
+        NV_index = np.rint(bt2390eetf_array(V, Lb, Lw, Lmin, Lmax)*(lt-1)).astype(np.intp)
+        target_pq = target_pq[NV_index]
     
-    m, k1 = max_uniform_target(len(monitor_real_pq), DEFAULT_LUT_LEN*10)
-    monitor_real_pq = linear_interpolate(np.array(monitor_real_pq), m)
-    convert_idx = []
-    len_idx_real = m
-    for itm in target_pq:
-        idx= find_nearest_idx(monitor_real_pq, itm)
-        pq = idx/(len_idx_real-1)
-        convert_idx.append(pq)
+    convert_idx = invert_monotone_curve(monitor_real_pq, target_pq)
     if not eetf_args:
         convert_idx[0] = 0
         convert_idx[1] = 1
-    return np.array(convert_idx)
+    return convert_idx
 
 
-def generate_mhc2_lut_from_measured_pq(real_pq, target_pq=None):
+def generate_mhc2_lut_from_measured_pq_batch(real_pq, target_pq=None, smooth=False, return_residuals=False):
+    """
+    多通道版本：一次向量化完成所有通道的 PQ→PQ 1D LUT 生成，不修改输入。
+    real_pq: (C, N) 各通道按均匀输入码值采样的实测 PQ（通常 C=3，顺序 R/G/B）
+    target_pq: None（恒等 ramp，长度 4096）、(M,)（各通道共用）或 (C, M)
+    smooth / return_residuals: 同 generate_mhc2_lut_from_measured_pq
+    返回: (C, M) ndarray；return_residuals=True 时返回 (lut, residuals)，residuals 为 (C, N)
+    """
     DEFAULT_LUT_LEN = 4096
-    for idx, itm in enumerate(real_pq):
-        if idx == 0:
-            continue
-        if itm < real_pq[idx-1]:
-            real_pq[idx] = real_pq[idx-1]
+    real = np.array(real_pq, dtype=float)
+    if real.ndim != 2 or real.shape[1] < 2:
+        raise ValueError("real_pq must be (C, N) with N >= 2")
+    n_ch = real.shape[0]
 
-    if not target_pq:
-        target_pq = np.linspace(0, 1, DEFAULT_LUT_LEN)
+    if target_pq is None or len(target_pq) == 0:
+        target = np.linspace(0, 1, DEFAULT_LUT_LEN)
     else:
-        target_pq = np.array(target_pq, dtype=float)
-    
-    m, k1 = max_uniform_target(len(real_pq), DEFAULT_LUT_LEN*10)
-    real_pq = linear_interpolate(np.array(real_pq), m)
-    convert_idx = []
-    len_idx_real = m
-    for itm in target_pq:
-        idx= find_nearest_idx(real_pq, itm)
-        pq = idx/(len_idx_real-1)
-        convert_idx.append(pq)
-    return np.array(convert_idx)
+        target = np.asarray(target_pq, dtype=float)
+    if target.ndim == 1:
+        target = np.broadcast_to(target, (n_ch, target.size))
+    elif target.shape[0] != n_ch:
+        raise ValueError("target_pq must be (M,) or (C, M)")
+
+    if smooth:
+        fits = [fit_monotone_curve(row, target_len=DEFAULT_LUT_LEN) for row in real]
+        curve = np.stack([f[0] for f in fits])
+        residuals = np.stack([f[1] for f in fits])
+    else:
+        curve = np.maximum.accumulate(real, axis=1)
+        residuals = real - curve
+    lut = invert_monotone_curve(curve, target)
+    if return_residuals:
+        return lut, residuals
+    return lut
+
+
+def generate_mhc2_lut_from_measured_pq(real_pq, target_pq=None, smooth=False, return_residuals=False):
+    """
+    由实测灰阶 PQ 生成 PQ→PQ 的 1D LUT（长度与 target_pq 相同，默认 4096）。
+    real_pq: 按均匀输入码值采样的实测 PQ（不会被修改）
+    target_pq: 目标输出曲线，默认恒等 ramp
+    smooth: True 时先用 fit_monotone_curve（保序回归 + PCHIP）拟合成平滑的稠密曲线再求反，
+            适合测量点较少（如 33 点）的情况；False 时为逐点非递减截断 + 分段线性。
+    return_residuals: True 时返回 (lut, residuals)，residuals 为每个测量点的 实测 - 拟合曲线，
+                      smooth=False 时即非递减截断量
+    单通道封装，实际计算见 generate_mhc2_lut_from_measured_pq_batch。
+    """
+    if target_pq is not None and len(target_pq) > 0:
+        target_pq = np.asarray(target_pq, dtype=float).ravel()
+    lut, residuals = generate_mhc2_lut_from_measured_pq_batch([np.asarray(real_pq, dtype=float).ravel()],
+                                                              target_pq, smooth=smooth, return_residuals=True)
+    if return_residuals:
+        return lut[0], residuals[0]
+    return lut[0]
 
 
 def eetf_from_lut(lut, eetf_args=None):
     """
     从现有的 LUT 生成 EETF 曲线
+    lut: list / ndarray / Lut1D；传入 Lut1D 时返回 Lut1D，否则返回 ndarray
     """
     TARGET_LEN = 4096
+    as_lut1d = isinstance(lut, Lut1D)
     idx_target = np.linspace(0, 1, TARGET_LEN)
     if eetf_args:
         Lb = eetf_args["source_min"]
         Lw = eetf_args["source_max"]
         Lmin = eetf_args["monitor_min"]
         Lmax = eetf_args["monitor_max"]
-        idx_target_eetf = []
-        for idx in range(len(idx_target)):
-            V = idx_target[idx]
-            idx_target_eetf.append(float(bt2390eetf(V, Lb, Lw, Lmin, Lmax)))
-        idx_target = np.array(idx_target_eetf)
-    if lut == [0, 1]:
-        return idx_target
-    len_lut = len(lut)
-    convert_idx = []
-    for itm in idx_target:
-        idx= int(round(itm * (len_lut-1)))
-        pq = lut[idx]
-        convert_idx.append(pq)
+        idx_target = bt2390eetf_array(idx_target, Lb, Lw, Lmin, Lmax)
+    lut = np.asarray(lut, dtype=float)
+    if lut.shape == (2,) and lut[0] == 0 and lut[1] == 1:
+        return Lut1D(idx_target, copy=False) if as_lut1d else idx_target
+    idx = np.rint(idx_target * (len(lut)-1)).astype(np.intp)
+    convert_idx = lut[idx]
     # When pq idx 0, turn off the mini‑LED backlight or power down the OLED.
     convert_idx[0] = 0
-    return np.array(convert_idx)
+    return Lut1D(convert_idx, copy=False) if as_lut1d else convert_idx
 
 # 示例：生成 LUT 数据并输出（可根据需要修改参数）
 if __name__ == "__main__":
@@ -0,0 +1,651 @@
+import numpy as np
+
+# MHC2 1D LUT 的数组封装。
+# 约定：LUT 输入域为 [0,1] 上的均匀采样，第 i 项对应输入 i/(N-1)。
+# Lut1D / Lut1D3 内部数据只读，复制与深拷贝都直接返回自身，
+# 因此可以在 MHC2 字典之间安全共享，无需 list <-> ndarray 往返或 deepcopy。
+
+
+def _searchsorted_rows(y, t):
+    """
+    逐行的 np.searchsorted(y[c], t[c], side="left")，一次向量化完成。
+    y: (C, N) 每行非递减；t: (C, M)
+    将 [t, y] 按行稳定排序，相等时 t 排在 y 前，t 之前的 y 个数即为严格小于 t 的个数。
+    """
+    m = t.shape[-1]
+    order = np.argsort(np.concatenate([t, y], axis=-1), axis=-1, kind="stable")
+    n_less = np.cumsum(order >= m, axis=-1)
+    is_t = order < m
+    rows = np.nonzero(is_t)[0]
+    j = np.empty(t.shape, dtype=np.intp)
+    j[rows, order[is_t]] = n_less[is_t]
+    return j
+
+
+def invert_monotone_curve(curve, targets):
+    """
+    单调非递减曲线的反函数求值：有序查找 + 相邻点线性插值，复杂度 O(M log N)。
+    curve: 在 [0,1] 上均匀采样的非递减曲线 y，shape (N,) 或多通道 (C, N)，N >= 2
+    targets: 需要反查的 y 值；curve 为 (N,) 时为标量或任意形状，为 (C, N) 时为 (C, M)
+    返回:
+      与 targets 同形状的 x ∈ [0,1]，满足 curve(x) ≈ target（分段线性意义下精确）。
+      - 目标低于曲线起点时返回 0；
+      - 目标高于曲线终点时返回末尾平坦区的第一个位置（与 find_nearest_idx 的取法一致）；
+      - 目标恰好落在平坦区时取该平坦区的第一个位置。
+    """
+    y = np.asarray(curve, dtype=float)
+    t = np.asarray(targets, dtype=float)
+    if y.ndim == 2:
+        if t.ndim != 2 or t.shape[0] != y.shape[0]:
+            raise ValueError("targets must be (C, M) for a (C, N) curve")
+        take = lambda idx: np.take_along_axis(y, idx, axis=-1)
+        j = _searchsorted_rows(y, t)
+        top = np.argmax(y == y[:, -1:], axis=-1)[:, None]
+    else:
+        y = y.ravel()
+        take = lambda idx: y[idx]
+        j = np.searchsorted(y, t, side="left")
+        top = np.searchsorted(y, y[-1], side="left")
+    n = y.shape[-1]
+    if n < 2:
+        raise ValueError("curve length must be >= 2")
+
+    # 第一个 y[j] >= t 的位置，区间 [j-1, j] 内做线性插值
+    hi = np.clip(j, 1, n - 1)
+    y0 = take(hi - 1)
+    dy = take(hi) - y0
+    pos_dy = dy > 0
+    frac = np.where(pos_dy, (t - y0) / np.where(pos_dy, dy, 1.0), 0.0)
+    x = (hi - 1 + np.clip(frac, 0.0, 1.0)) / (n - 1)
+
+    x = np.where(j <= 0, 0.0, x)
+    x = np.where(j >= n, top / (n - 1), x)
+    return x
+
+
+def _pchip_slopes(x, y):
+    """
+    Fritsch–Carlson 单调三次 Hermite 插值的节点导数（与 scipy PchipInterpolator 相同规则）。
+    """
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    n = x.size
+    d = np.zeros(n, dtype=float)
+    if n == 2:
+        d[:] = delta[0]
+        return d
+
+    # 内部节点：相邻割线同号时取加权调和平均，否则为 0
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same_sign = (delta[:-1] * delta[1:]) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hm = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    d[1:-1] = np.where(same_sign, hm, 0.0)
+
+    # 端点：三点公式 + 形状保持修正
+    def edge(h0, h1, m0, m1):
+        de = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+        if np.sign(de) != np.sign(m0):
+            return 0.0
+        if np.sign(m0) != np.sign(m1) and abs(de) > abs(3 * m0):
+            return 3 * m0
+        return de
+
+    d[0] = edge(h[0], h[1], delta[0], delta[1])
+    d[-1] = edge(h[-1], h[-2], delta[-1], delta[-2])
+    return d
+
+# apply 时每块处理的最大样本数（按像素计），限制临时数组的内存占用
+APPLY_CHUNK = 1 << 18
+APPLY_METHODS = ("nearest", "linear", "cubic")
+
+
+def _interp_uniform(y, d, x, method):
+    """
+    在 [0,1] 均匀采样的单通道表 y 上求值。
+    y: (N,)；d: 以下标为单位的 PCHIP 节点导数 (N,)（仅 cubic 使用）；x: 任意形状，已裁剪到 [0,1]
+    """
+    scale = y.size - 1
+    if method == "nearest":
+        return y[np.clip(np.rint(x * scale).astype(np.intp), 0, scale)]
+    p = x * scale
+    k = np.clip(p.astype(np.intp), 0, scale - 1)
+    t = p - k
+    y0 = y[k]
+    y1 = y[k + 1]
+    if method == "linear":
+        return y0 + (y1 - y0) * t
+    t2 = t * t
+    t3 = t2 * t
+    return ((2 * t3 - 3 * t2 + 1) * y0 + (t3 - 2 * t2 + t) * d[k]
+            + (-2 * t3 + 3 * t2) * y1 + (t3 - t2) * d[k + 1])
+
+
+def _chunks(n, chunk):
+    chunk = max(int(chunk), 1)
+    for start in range(0, n, chunk):
+        yield start, min(start + chunk, n)
+
+
+def _readonly(values, copy):
+    arr = np.array(values, dtype=np.float64, copy=True) if copy \
+        else np.asarray(values, dtype=np.float64).view()
+    arr.flags.writeable = False
+    return arr
+
+
+def _readonly_as(arr, dtype):
+    """只读的 dtype 副本（LUT 表按精度缓存用）。"""
+    out = arr.astype(dtype)
+    out.flags.writeable = False
+    return out
+
+
+class Lut1D:
+    """
+    不可变的单通道 1D LUT (float64)。
+    - values: 只读 ndarray 视图（零拷贝）
+    - 支持 len / 下标 / 迭代 / np.asarray，与原来的 list 用法兼容
+    - 与 list/ndarray 比较时按值整体比较（如 lut == [0, 1]）
+    """
+    __slots__ = ("_data",)
+    __hash__ = None
+
+    def __init__(self, values, copy=True):
+        """
+        values: list / ndarray / Lut1D
+        copy: False 时与传入的 ndarray 共享内存（调用方不应再修改原数组）
+        """
+        if isinstance(values, Lut1D):
+            data = values._data
+        else:
+            data = _readonly(values, copy).ravel()
+        if data.size < 2:
+            raise ValueError("lut length must be >= 2")
+        self._data = data
+
+    @classmethod
+    def identity(cls, length=4096):
+        return cls(np.linspace(0, 1, length), copy=False)
+
+    @property
+    def values(self):
+        return self._data
+
+    def tolist(self):
+        return self._data.tolist()
+
+    def to_array(self):
+        """返回可写的副本。"""
+        return self._data.copy()
+
+    def __len__(self):
+        return self._data.size
+
+    def __getitem__(self, idx):
+        return self._data[idx]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self._data, dtype=dtype, copy=True)
+        if dtype is None:
+            return self._data
+        return self._data.astype(dtype, copy=False)
+
+    def __eq__(self, other):
+        if isinstance(other, Lut1D):
+            other = other._data
+        elif not isinstance(other, (list, tuple, np.ndarray)):
+            return NotImplemented
+        other = np.asarray(other, dtype=float).ravel()
+        return other.shape == self._data.shape and bool(np.all(other == self._data))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"Lut1D(len={len(self)}, first={self._data[0]:.6f}, last={self._data[-1]:.6f})"
+
+    def __call__(self, x):
+        """在任意输入 x ∈ [0,1] 处线性插值求值。"""
+        x = np.clip(np.asarray(x, dtype=np.float64), 0.0, 1.0)
+        grid = np.linspace(0, 1, self._data.size)
+        return np.interp(x, grid, self._data)
+
+    def compose(self, inner):
+        """
+        复合: 返回 x -> self(inner(x))，长度与 inner 相同。
+        inner: Lut1D 或 array-like（同样按 [0,1] 均匀采样）
+        """
+        inner = inner if isinstance(inner, Lut1D) else Lut1D(inner, copy=False)
+        return Lut1D(self(inner.values), copy=False)
+
+    def invert(self, length=None):
+        """
+        反函数 LUT（要求非递减），默认长度与自身相同。
+        """
+        if np.any(np.diff(self._data) < 0):
+            raise ValueError("lut must be non-decreasing to invert")
+        length = len(self) if length is None else int(length)
+        return Lut1D(invert_monotone_curve(self._data, np.linspace(0, 1, length)), copy=False)
+
+    def resample(self, length):
+        """线性插值重采样到 length 项。"""
+        length = int(length)
+        if length == len(self):
+            return self
+        return Lut1D(self(np.linspace(0, 1, length)), copy=False)
+
+    def compress(self, max_error=0.5, code_max=1023):
+        """压缩为 KnotLut1D，参数见 KnotLut1D.from_lut。"""
+        return KnotLut1D.from_lut(self._data, max_error, code_max)
+
+    def scale(self, scale):
+        """输出乘以 scale 并裁剪到 [0,1]（同 lut_scale）。"""
+        scale = float(scale)
+        if scale <= 0:
+            raise ValueError("scale 必须 > 0")
+        return Lut1D(np.clip(self._data * scale, 0.0, 1.0), copy=False)
+
+
+def _fit_knots(y, tol):
+    """
+    在采样点上贪心选取折线节点，使所有采样点到折线的偏差 <= tol。
+    从当前节点 i 出发，维护斜率可行区间 [lo, hi]（由 i 之后每个点的 ±tol 约束相交得到），
+    只要 i->j 的斜率仍落在 i..j-1 构成的区间内就继续延伸；节点限定在采样点上时，这种最远延伸即为最少节点。
+    返回节点下标 (K,) intp，首尾必为 0 与 N-1。
+    """
+    n = y.size
+    knots = [0]
+    i = 0
+    while i < n - 1:
+        lo, hi = -np.inf, np.inf
+        j = i + 1
+        while j < n:
+            d = j - i
+            s = (y[j] - y[i]) / d
+            if s < lo or s > hi:
+                break
+            lo = max(lo, (y[j] - tol - y[i]) / d)
+            hi = min(hi, (y[j] + tol - y[i]) / d)
+            j += 1
+        i = j - 1
+        knots.append(i)
+    return np.asarray(knots, dtype=np.intp)
+
+
+class KnotLut1D:
+    """
+    节点压缩的 1D LUT：只保存折线节点 (下标, 值)，展开后与原 LUT 的最大偏差不超过给定误差。
+    近似恒等或分段平滑的 4096 点曲线通常只需几十个节点，便于比较、存储与交互编辑。
+    - knots: 节点在稠密 LUT 中的下标 (K,)，只读
+    - knot_values: 节点处的值 (K,)，只读
+    - length: 展开后的稠密长度
+    - max_error: 实际展开误差（LUT 值单位，[0,1]）
+    """
+    __slots__ = ("_knots", "_values", "_length", "_max_error")
+    __hash__ = None
+
+    def __init__(self, knots, knot_values, length, max_error=0.0):
+        knots = _readonly(knots, copy=True).astype(np.intp)
+        knots.flags.writeable = False
+        values = _readonly(knot_values, copy=True)
+        length = int(length)
+        if knots.ndim != 1 or knots.shape != values.shape or knots.size < 2:
+            raise ValueError("knots and knot_values must be 1D with the same length >= 2")
+        if knots[0] != 0 or knots[-1] != length - 1 or np.any(np.diff(knots) <= 0):
+            raise ValueError("knots must be strictly increasing from 0 to length-1")
+        self._knots = knots
+        self._values = values
+        self._length = length
+        self._max_error = float(max_error)
+
+    @classmethod
+    def from_lut(cls, lut, max_error=0.5, code_max=1023):
+        """
+        从稠密 LUT 压缩。
+        max_error: 允许的最大偏差，单位为 PQ 码值（默认 10bit，即 0.5/1023）；0 表示只合并共线段，可无损还原
+        code_max: 码值满量程，1023 对应 10bit，4095 对应 12bit
+        """
+        if max_error < 0:
+            raise ValueError("max_error must be >= 0")
+        y = np.asarray(lut, dtype=np.float64).ravel()
+        if y.size < 2:
+            raise ValueError("lut length must be >= 2")
+        knots = _fit_knots(y, max_error / code_max)
+        dense = np.interp(np.arange(y.size), knots, y[knots])
+        return cls(knots, y[knots], y.size, np.max(np.abs(dense - y)))
+
+    @property
+    def knots(self):
+        return self._knots
+
+    @property
+    def knot_values(self):
+        return self._values
+
+    @property
+    def length(self):
+        return self._length
+
+    @property
+    def max_error(self):
+        return self._max_error
+
+    def __len__(self):
+        return self._length
+
+    def to_array(self):
+        """展开为稠密 ndarray（可写）。"""
+        return np.interp(np.arange(self._length), self._knots, self._values)
+
+    def to_lut(self):
+        """展开为 Lut1D，可直接交给 write_MHC2。"""
+        return Lut1D(self.to_array(), copy=False)
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.to_array()
+        return arr if dtype is None else arr.astype(dtype, copy=False)
+
+    def __call__(self, x):
+        """在任意输入 x ∈ [0,1] 处求值，只在节点上插值，与展开后的 Lut1D(x) 一致。"""
+        x = np.clip(np.asarray(x, dtype=np.float64), 0.0, 1.0)
+        return np.interp(x * (self._length - 1), self._knots, self._values)
+
+    def __eq__(self, other):
+        if not isinstance(other, KnotLut1D):
+            return NotImplemented
+        return (self._length == other._length and self._knots.shape == other._knots.shape
+                and bool(np.all(self._knots == other._knots))
+                and bool(np.all(self._values == other._values)))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"KnotLut1D(len={self._length}, knots={self._knots.size}, max_error={self._max_error:.3g})"
+
+
+class Lut1D3:
+    """
+    不可变的三通道 1D LUT，内部为 (3, N) float64 只读数组。
+    red/green/blue 返回共享内存的 Lut1D 视图。
+    """
+    __slots__ = ("_data", "_slopes", "_data32", "_slopes32")
+    __hash__ = None
+    CHANNELS = ("red", "green", "blue")
+
+    def __init__(self, red, green=None, blue=None, copy=True):
+        """
+        red/green/blue: 各通道 LUT；green/blue 为 None 时复制 red（灰阶）。
+        也可只传一个 (3, N) 数组。
+        """
+        if green is None and blue is None and np.ndim(red) == 2:
+            data = _readonly(red, copy)
+        else:
+            green = red if green is None else green
+            blue = red if blue is None else blue
+            chans = [np.asarray(c, dtype=np.float64).ravel() for c in (red, green, blue)]
+            if not (chans[0].size == chans[1].size == chans[2].size):
+                raise ValueError("all LUT channels must have the same length >= 2")
+            data = _readonly(np.stack(chans), copy=False)
+        if data.ndim != 2 or data.shape[0] != 3 or data.shape[1] < 2:
+            raise ValueError("all LUT channels must have the same length >= 2")
+        self._data = data
+        self._slopes = None
+        self._data32 = None
+        self._slopes32 = None
+
+    @classmethod
+    def from_mhc2(cls, mhc2):
+        """从 read_MHC2 风格的字典 {"red_lut", "green_lut", "blue_lut"} 构造。"""
+        return cls(mhc2["red_lut"], mhc2["green_lut"], mhc2["blue_lut"])
+
+    @classmethod
+    def identity(cls, length=4096):
+        return cls(np.linspace(0, 1, length), copy=False)
+
+    def to_mhc2(self, mhc2):
+        """写回 MHC2 字典（原地更新三个通道与 entry_count），返回该字典。"""
+        mhc2["red_lut"], mhc2["green_lut"], mhc2["blue_lut"] = self.channels
+        mhc2["entry_count"] = len(self)
+        return mhc2
+
+    @property
+    def values(self):
+        return self._data
+
+    @property
+    def red(self):
+        return Lut1D(self._data[0], copy=False)
+
+    @property
+    def green(self):
+        return Lut1D(self._data[1], copy=False)
+
+    @property
+    def blue(self):
+        return Lut1D(self._data[2], copy=False)
+
+    @property
+    def channels(self):
+        return self.red, self.green, self.blue
+
+    def __len__(self):
+        return self._data.shape[1]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self._data, dtype=dtype, copy=True)
+        if dtype is None:
+            return self._data
+        return self._data.astype(dtype, copy=False)
+
+    def __eq__(self, other):
+        if not isinstance(other, Lut1D3):
+            return NotImplemented
+        return other._data.shape == self._data.shape and bool(np.all(other._data == self._data))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"Lut1D3(len={len(self)})"
+
+    def _map(self, fn):
+        return Lut1D3(*(fn(c) for c in self.channels), copy=False)
+
+    def _cubic_slopes(self):
+        """各通道的 PCHIP 节点导数（以下标为单位），首次使用时计算并缓存。"""
+        if self._slopes is None:
+            x = np.arange(len(self), dtype=float)
+            slopes = np.stack([_pchip_slopes(x, c) for c in self._data])
+            slopes.flags.writeable = False
+            self._slopes = slopes
+        return self._slopes
+
+    def _tables(self, dtype, cubic):
+        """按精度取 (表, PCHIP 导数或 None)；float32 副本首次使用时转换并缓存，之后不再逐次复制。"""
+        if dtype == np.float64:
+            return self._data, self._cubic_slopes() if cubic else None
+        if dtype != np.float32:
+            return self._data.astype(dtype), self._cubic_slopes().astype(dtype) if cubic else None
+        if self._data32 is None:
+            self._data32 = _readonly_as(self._data, dtype)
+        if cubic and self._slopes32 is None:
+            self._slopes32 = _readonly_as(self._cubic_slopes(), dtype)
+        return self._data32, self._slopes32 if cubic else None
+
+    def apply(self, rgb, method="nearest", chunk=APPLY_CHUNK, dtype=np.float64):
+        """
+        逐通道查表，rgb: (..., 3)，输入裁剪到 [0,1]。
+        method:
+          - "nearest": 最近邻（与 MHC2 在硬件上的取整一致）
+          - "linear": 相邻表项线性插值
+          - "cubic": 单调三次 (PCHIP) 插值，单调 LUT 下结果单调且无过冲
+        chunk: 每块处理的样本数，限制大图像的临时内存
+        dtype: 计算与输出精度，np.float64（默认）或 np.float32（表格同样转为 float32，转换结果缓存在实例上）
+        """
+        if method not in APPLY_METHODS:
+            raise ValueError(f"method must be one of {APPLY_METHODS}")
+        rgb = np.asarray(rgb, dtype=dtype)
+        if rgb.ndim == 0 or rgb.shape[-1] != 3:
+            raise ValueError("last dim of rgb must be 3")
+        table, slopes = self._tables(rgb.dtype, method == "cubic")
+        if slopes is None:
+            slopes = (None, None, None)
+        src = rgb.reshape(-1, 3)
+        out = np.empty(src.shape, dtype=rgb.dtype)
+        for start, end in _chunks(src.shape[0], chunk):
+            block = np.clip(src[start:end], 0.0, 1.0)
+            for c in range(3):
+                out[start:end, c] = _interp_uniform(table[c], slopes[c], block[:, c], method)
+        return out.reshape(rgb.shape)
+
+    def compose(self, inner):
+        """逐通道复合: x -> self(inner(x))。"""
+        inner = inner if isinstance(inner, Lut1D3) else Lut1D3(inner, copy=False)
+        return Lut1D3(*(a.compose(b) for a, b in zip(self.channels, inner.channels)), copy=False)
+
+    def invert(self, length=None):
+        return self._map(lambda c: c.invert(length))
+
+    def resample(self, length):
+        if int(length) == len(self):
+            return self
+        return self._map(lambda c: c.resample(length))
+
+    def scale(self, scale):
+        """scale: 标量或 (r, g, b) 三个缩放系数。"""
+        scales = np.broadcast_to(np.asarray(scale, dtype=float), (3,))
+        return Lut1D3(*(c.scale(s) for c, s in zip(self.channels, scales)), copy=False)
+
+
+class Lut3D:
+    """
+    不可变的 3D LUT，内部为 (N, N, N, 3) float64 只读数组，table[r, g, b] 为输入
+    (r, g, b)/(N-1) 处的输出 RGB。常见 N = 17 / 33 / 65。
+    """
+    __slots__ = ("_data", "_flat", "_flat32")
+    __hash__ = None
+
+    def __init__(self, table, copy=True):
+        data = _readonly(table, copy)
+        n = data.shape[0]
+        if data.ndim != 4 or data.shape != (n, n, n, 3) or n < 2:
+            raise ValueError("table must be (N, N, N, 3) with N >= 2")
+        self._data = data
+        self._flat = data.reshape(-1, 3)
+        self._flat32 = None
+
+    @classmethod
+    def identity(cls, size=33):
+        g = np.linspace(0, 1, size)
+        return cls(np.stack(np.meshgrid(g, g, g, indexing="ij"), axis=-1), copy=False)
+
+    @classmethod
+    def from_function(cls, fn, size=33):
+        """对网格点批量调用 fn((M, 3)) -> (M, 3) 生成 3D LUT。"""
+        grid = cls.identity(size).values.reshape(-1, 3)
+        return cls(np.asarray(fn(grid), dtype=float).reshape(size, size, size, 3), copy=False)
+
+    @property
+    def values(self):
+        return self._data
+
+    @property
+    def size(self):
+        return self._data.shape[0]
+
+    def __len__(self):
+        return self._data.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self._data, dtype=dtype, copy=True)
+        if dtype is None:
+            return self._data
+        return self._data.astype(dtype, copy=False)
+
+    def __eq__(self, other):
+        if not isinstance(other, Lut3D):
+            return NotImplemented
+        return other._data.shape == self._data.shape and bool(np.all(other._data == self._data))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"Lut3D(size={self.size})"
+
+    def _apply_block(self, block, lut):
+        """四面体插值，block: (M, 3) 已裁剪到 [0,1]；lut: 展平的 (N³, 3) 表。"""
+        n = self.size
+        p = block * (n - 1)
+        base = np.minimum(p.astype(np.intp), n - 2)
+        f = p - base
+        strides = np.array([n * n, n, 1], dtype=np.intp)
+        idx0 = base @ strides
+
+        # 按小数部分从大到小排序，沿对应坐标轴依次走到对角顶点
+        order = np.argsort(-f, axis=1, kind="stable")
+        fs = np.take_along_axis(f, order, axis=1)
+        step = strides[order]
+        idx1 = idx0 + step[:, 0]
+        idx2 = idx1 + step[:, 1]
+        idx3 = idx0 + strides.sum()
+
+        out = lut[idx0] * (1.0 - fs[:, :1])
+        out += lut[idx1] * (fs[:, :1] - fs[:, 1:2])
+        out += lut[idx2] * (fs[:, 1:2] - fs[:, 2:3])
+        out += lut[idx3] * fs[:, 2:3]
+        return out
+
+    def apply(self, rgb, chunk=APPLY_CHUNK, dtype=np.float64):
+        """
+        rgb: (..., 3)，输入裁剪到 [0,1]，按 chunk 分块做四面体插值。
+        dtype: 计算与输出精度，np.float64（默认）或 np.float32
+        """
+        rgb = np.asarray(rgb, dtype=dtype)
+        if rgb.ndim == 0 or rgb.shape[-1] != 3:
+            raise ValueError("last dim of rgb must be 3")
+        if rgb.dtype == np.float64:
+            lut = self._flat
+        elif rgb.dtype == np.float32:
+            # float32 表首次使用时转换并缓存（65³ 表约 3.3 MB），分块 / 逐帧调用不再重复复制
+            if self._flat32 is None:
+                self._flat32 = _readonly_as(self._flat, rgb.dtype)
+            lut = self._flat32
+        else:
+            lut = self._flat.astype(rgb.dtype)
+        src = rgb.reshape(-1, 3)
+        out = np.empty(src.shape, dtype=rgb.dtype)
+        for start, end in _chunks(src.shape[0], chunk):
+            out[start:end] = self._apply_block(np.clip(src[start:end], 0.0, 1.0), lut)
+        return out.reshape(rgb.shape)
+
+    def to_cube(self, path, title="rwhc"):
+        """导出为 .cube 文本（红色变化最快的标准顺序）。"""
+        n = self.size
+        rows = self._data.transpose(2, 1, 0, 3).reshape(-1, 3)
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(f'TITLE "{title}"\n')
+            fp.write(f"LUT_3D_SIZE {n}\n")
+            fp.write("DOMAIN_MIN 0.0 0.0 0.0\nDOMAIN_MAX 1.0 1.0 1.0\n")
+            np.savetxt(fp, rows, fmt="%.6f")
@@ -1,5 +1,6 @@
 import numpy as np
 from convert_utils import *
+from chromatic_adaptation import adaptation_matrices, adaptation_matrix, adapt_XYZ
 
 
 def build_rgb_to_xyz_from_primaries(xy_R, xy_G, xy_B, xy_W):
@@ -31,31 +32,9 @@ def calculate_bradford_matrix(xy_A, xy_B):
         xy_B: 目标白点 (x, y)
     返回:
         3x3 矩阵 M，使得 XYZ_B = M @ XYZ_A
+    批量计算 / 缓存 / 其他方法见 chromatic_adaptation。
     """
-    # 1. 将 xy 转换为 XYZ (Y=1)
-    XYZ_A = xyY_to_XYZ([*xy_A, 10000])
-    XYZ_B = xyY_to_XYZ([*xy_B, 10000])
-
-    # 2. 定义 Bradford 变换矩阵 (XYZ -> LMS)
-    M_A = np.array([
-        [0.8951, 0.2664, -0.1614],
-        [-0.7502, 1.7135, 0.0367],
-        [0.0389, -0.0685, 1.0296]
-    ])
-    
-    # 3. 计算源白点和目标白点在 LMS 空间中的坐标
-    LMS_A = M_A @ XYZ_A
-    LMS_B = M_A @ XYZ_B
-
-    # 4. 计算 LMS 空间的缩放矩阵
-    # 防止除以零
-    LMS_A = np.where(LMS_A == 0, 1e-10, LMS_A)
-    M_scale = np.diag(LMS_B / LMS_A)
-
-    # 5. 组合最终矩阵: M = inv(M_A) @ M_scale @ M_A
-    M_bradford = np.linalg.inv(M_A) @ M_scale @ M_A
-
-    return M_bradford
+    return adaptation_matrices(xy_A, xy_B, "bradford")
 
 
 def calc_rgb_mapping_matrix(source_primaries, target_primaries):
@@ -97,6 +76,29 @@ def calc_rgb_mapping_matrix_non_normalized(source_primaries, target_primaries):
     return mapping
 
 
+# dropY 拟合中按 xy 重建 XYZ 时使用的固定亮度
+DROPY_Y_ABS = 10.0
+
+def _normal_equations(XYZ_measured, XYZ_target, w=None):
+    """
+    C @ X_meas ≈ X_tgt 的法方程（闭式构造）。
+    逐样本的设计矩阵 (I3 ⊗ x_i^T) 是块对角的，A^T A = I3 ⊗ G，A^T b = vec(B)（行优先），其中
+      G = Σ w_i x_i x_i^T  (3,3)，B = Σ w_i t_i x_i^T  (3,3)
+    一次矩阵乘法得到，不构造 (3n, 9) 的 A。
+    返回 (G, B)
+    """
+    XYZ_measured = np.asarray(XYZ_measured, float)
+    XYZ_target = np.asarray(XYZ_target, float)
+    if XYZ_measured.ndim != 2 or XYZ_measured.shape[1] != 3 or XYZ_target.shape != XYZ_measured.shape:
+        raise ValueError("X_meas/X_tgt must be (n,3) with the same shape")
+    Xw = XYZ_measured
+    if w is not None:
+        w = np.asarray(w, float).reshape(-1)
+        if w.size != XYZ_measured.shape[0]:
+            raise ValueError("weights length mismatch")
+        Xw = XYZ_measured * w[:, None]
+    return Xw.T @ XYZ_measured, XYZ_target.T @ Xw
+
 def fit_XYZ2XYZ_wlock(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_target, w=None, l2=0.0):
     """
     拟合 3x3 矩阵 C，使得 C @ X_meas ≈ X_tgt，并满足白点硬约束 C @ Xw_meas = Xw_tgt。
@@ -110,66 +112,37 @@ def fit_XYZ2XYZ_wlock(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_target, w=
     返回:
       C: (3,3)  校正矩阵（XYZ→XYZ）
     """
-    XYZ_measured = np.asarray(XYZ_measured, float)
-    XYZ_target  = np.asarray(XYZ_target,  float)
     XYZ_w_measured = np.asarray(XYZ_w_measured, float).reshape(3)
     XYZ_w_target  = np.asarray(XYZ_w_target,  float).reshape(3)
-    n = XYZ_measured.shape[0]
-    I3 = np.eye(3)
-
-    # 构造普通样本的 A、b：  vec(C) 的未知量个数=9
-    # 对每个样本 i： (I3 ⊗ X_meas[i]^T) · vec(C) ≈ X_tgt[i]
-    A = np.zeros((3*n, 9))
-    b = XYZ_target.reshape(-1)
-    for i in range(n):
-        xi = XYZ_measured[i].reshape(1,3)               # (1,3)
-        A[3*i:3*i+3, :] = np.kron(I3, xi)         # (3,9)
-
-    # 加权（可选）
-    if w is not None:
-        w = np.asarray(w, float).reshape(-1)
-        W = np.repeat(np.sqrt(w), 3)              # 对XYZ 3维同步加权
-        A = A * W[:,None]
-        b = b * W
-
-    # 白点硬约束： C @ Xw_meas = Xw_tgt
-    # 约束矩阵 Cc 满足： (I3 ⊗ Xw_meas^T) · vec(C) = Xw_tgt
-    Cc = np.kron(I3, XYZ_w_measured.reshape(1,3))        # (3,9)
-    d  = XYZ_w_target.reshape(3)
-
-    # L2 正则（可选）：在 ATA 对角线上加 l2
-    ATA = A.T @ A
-    ATb = A.T @ b
+    G, B = _normal_equations(XYZ_measured, XYZ_target, w)
     if l2 > 0:
-        ATA = ATA + l2 * np.eye(9)
+        G = G + l2 * np.eye(3)
 
-    # 组装 KKT 系统：
-    # [ ATA   Cc^T ] [m]   = [ATb]
-    # [ Cc     0  ] [λ]     [ d ]
-    KKT = np.block([
-        [ATA,        Cc.T],
-        [Cc,  np.zeros((3,3))]
-    ])
-    rhs = np.concatenate([ATb, d])
+    # 9 元 KKT 系统按 C 的三行解耦，三行共用同一个 4x4 系统，右端各不相同：
+    # [ G      Xw_meas ] [c_r]   = [B_r     ]
+    # [ Xw_meas^T   0  ] [λ_r]     [Xw_tgt_r]
+    KKT = np.zeros((4, 4))
+    KKT[:3, :3] = G
+    KKT[:3, 3] = XYZ_w_measured
+    KKT[3, :3] = XYZ_w_measured
+    rhs = np.vstack([B.T, XYZ_w_target])
 
     sol = np.linalg.solve(KKT, rhs)
-    m = sol[:9]  # vec(C)
-    # 注意这里 vec 是按行块构造的： (I3 ⊗ x^T)，因此还原时用行优先
-    C = m.reshape(3,3, order='C')
+    C = sol[:3].T
     return C
 
-def fit_XYZ2XYZ_wlock_dropY(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_target, w=None, l2=0.0):
+def _dropY_samples(XYZ_measured, XYZ_target):
+    """
+    去掉亮度只保留色度：把样本按各自的 xy 重建为 Y 固定的 XYZ。
+    返回 (measured_fixed, target_fixed, valid)，valid 为 (n,) bool，只有 valid 的样本出现在前两项中。
+    """
     XYZ_measured = np.asarray(XYZ_measured, float)
     XYZ_target  = np.asarray(XYZ_target,  float)
-    XYZ_w_measured = np.asarray(XYZ_w_measured, float).reshape(3)
-    XYZ_w_target  = np.asarray(XYZ_w_target,  float).reshape(3)
     if XYZ_measured.ndim != 2 or XYZ_measured.shape[1] != 3 or XYZ_target.shape != XYZ_measured.shape:
         raise ValueError("X_meas/X_tgt must be (n,3) with the same shape")
 
     xy_measured = XYZ_to_xy(XYZ_measured)  # (n,2) with possible nan for invalid rows
     xy_target  = XYZ_to_xy(XYZ_target)
-    xy_w_measured = XYZ_to_xy(XYZ_w_measured)
-    xy_w_target  = XYZ_to_xy(XYZ_w_target)
 
     valid = (
         np.all(np.isfinite(xy_measured), axis=1) &
@@ -182,61 +155,35 @@ def fit_XYZ2XYZ_wlock_dropY(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_targ
 
     xy_measured = xy_measured[valid]
     xy_target  = xy_target[valid]
-    
 
-    Y_abs = 10.0
-    xyY_measured = np.column_stack([xy_measured, np.full(xy_measured.shape[0], Y_abs, dtype=float)])
-    xyY_target  = np.column_stack([xy_target,  np.full(xy_target.shape[0],  Y_abs, dtype=float)])
+    xyY_measured = np.column_stack([xy_measured, np.full(xy_measured.shape[0], DROPY_Y_ABS, dtype=float)])
+    xyY_target  = np.column_stack([xy_target,  np.full(xy_target.shape[0],  DROPY_Y_ABS, dtype=float)])
+    return xyY_to_XYZ(xyY_measured), xyY_to_XYZ(xyY_target), valid
 
-    xyz_measured_fixed = xyY_to_XYZ(xyY_measured)  
-    xyz_target_fixed  = xyY_to_XYZ(xyY_target)
-    xyz_w_measured_fixed = xyY_to_XYZ([*xy_w_measured, Y_abs])
-    xyz_w_target_fixed  = xyY_to_XYZ([*xy_w_target,  Y_abs])
+def _dropY_white(XYZ_w_measured, XYZ_w_target):
+    xy_w_measured = XYZ_to_xy(np.asarray(XYZ_w_measured, float).reshape(3))
+    xy_w_target  = XYZ_to_xy(np.asarray(XYZ_w_target,  float).reshape(3))
+    return xyY_to_XYZ([*xy_w_measured, DROPY_Y_ABS]), xyY_to_XYZ([*xy_w_target, DROPY_Y_ABS])
 
-    ww = None
-    if w is not None:
-        w = np.asarray(w, float).reshape(-1)
-        if w.size != XYZ_measured.shape[0]:
-            raise ValueError("weights length mismatch")
-        ww = w[valid]
+def _valid_weights(w, valid):
+    if w is None:
+        return None
+    w = np.asarray(w, float).reshape(-1)
+    if w.size != valid.size:
+        raise ValueError("weights length mismatch")
+    return w[valid]
+
+def fit_XYZ2XYZ_wlock_dropY(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_target, w=None, l2=0.0):
+    xyz_measured_fixed, xyz_target_fixed, valid = _dropY_samples(XYZ_measured, XYZ_target)
+    xyz_w_measured_fixed, xyz_w_target_fixed = _dropY_white(XYZ_w_measured, XYZ_w_target)
+    ww = _valid_weights(w, valid)
 
     C = fit_XYZ2XYZ_wlock(xyz_measured_fixed, xyz_target_fixed, xyz_w_measured_fixed, xyz_w_target_fixed, w=ww, l2=l2)
     return C
 
 def fit_XYZ2XYZ_dropY(XYZ_measured, XYZ_target, w=None, l2=0.0):
-    XYZ_measured = np.asarray(XYZ_measured, float)
-    XYZ_target  = np.asarray(XYZ_target,  float)
-    if XYZ_measured.ndim != 2 or XYZ_measured.shape[1] != 3 or XYZ_target.shape != XYZ_measured.shape:
-        raise ValueError("X_meas/X_tgt must be (n,3) with the same shape")
-
-    xy_measured = XYZ_to_xy(XYZ_measured)  # (n,2) with possible nan for invalid rows
-    xy_target  = XYZ_to_xy(XYZ_target)
-
-    valid = (
-        np.all(np.isfinite(xy_measured), axis=1) &
-        np.all(np.isfinite(xy_target),  axis=1) &
-        (xy_measured[:, 1] > 0) &
-        (xy_target[:,  1] > 0)
-    )
-    if not np.any(valid):
-        raise ValueError("No valid samples after xy conversion")
-
-    xy_measured = xy_measured[valid]
-    xy_target  = xy_target[valid]
-
-    Y_abs = 10.0
-    xyY_measured = np.column_stack([xy_measured, np.full(xy_measured.shape[0], Y_abs, dtype=float)])
-    xyY_target  = np.column_stack([xy_target,  np.full(xy_target.shape[0],  Y_abs, dtype=float)])
-
-    X_meas_fixed = xyY_to_XYZ(xyY_measured)  
-    X_tgt_fixed  = xyY_to_XYZ(xyY_target)
-
-    ww = None
-    if w is not None:
-        w = np.asarray(w, float).reshape(-1)
-        if w.size != XYZ_measured.shape[0]:
-            raise ValueError("weights length mismatch")
-        ww = w[valid]
+    X_meas_fixed, X_tgt_fixed, valid = _dropY_samples(XYZ_measured, XYZ_target)
+    ww = _valid_weights(w, valid)
 
     C = fit_XYZ2XYZ(X_meas_fixed, X_tgt_fixed, w=ww, l2=l2)
     return C
@@ -255,42 +202,133 @@ def fit_XYZ2XYZ(XYZ_measured, XYZ_target, w=None, l2=0.0):
     """
     XYZ_measured = np.asarray(XYZ_measured, float)
     XYZ_target  = np.asarray(XYZ_target,  float)
-    n = XYZ_measured.shape[0]
-    if n == 0:
+    if XYZ_measured.shape[0] == 0:
         raise ValueError("No samples provided")
 
-    I3 = np.eye(3)
-    # Build A (3n x 9) and b (3n,)
-    A = np.zeros((3 * n, 9))
-    b = XYZ_target.reshape(-1)
-    for i in range(n):
-        xi = XYZ_measured[i].reshape(1, 3)
-        A[3*i:3*i+3, :] = np.kron(I3, xi)
-
-    # Apply weights if given (same scheme as white-lock version)
-    if w is not None:
-        w = np.asarray(w, float).reshape(-1)
-        if w.size != n:
-            raise ValueError("weights length mismatch")
-        W = np.repeat(np.sqrt(w), 3)
-        A = A * W[:, None]
-        b = b * W
-
-    ATA = A.T @ A
-    ATb = A.T @ b
+    # Normal equations are block-diagonal (I3 ⊗ G): each row of C solves G c_r = B_r
+    G, B = _normal_equations(XYZ_measured, XYZ_target, w)
     if l2 > 0:
-        ATA = ATA + l2 * np.eye(9)
+        G = G + l2 * np.eye(3)
 
     # Solve normal equations; fallback to lstsq if singular
     try:
-        m = np.linalg.solve(ATA, ATb)
+        C = np.linalg.solve(G, B.T).T
     except np.linalg.LinAlgError:
-        m, *_ = np.linalg.lstsq(A, b, rcond=None)
-
-    C = m.reshape(3, 3, order='C')
+        sw = 1.0 if w is None else np.sqrt(np.asarray(w, float).reshape(-1))[:, None]
+        C = np.linalg.lstsq(XYZ_measured * sw, XYZ_target * sw, rcond=None)[0].T
     return C
 
 
+# 稳健拟合（IRLS）：仪器误读、ABL 等造成的个别坏点不应拉偏整个矩阵。
+# 每轮按当前矩阵的样本残差 r_i = ||C x_i - t_i||（relative 时再除以 ||t_i||）
+# 与稳健尺度 s = 1.4826 * median(r) 计算权重：
+#   huber: w = min(1, c*s / r)，默认 c = 1.345
+#   tukey: w = (1 - (r / (c*s))^2)^2，r >= c*s 时为 0，默认 c = 4.685
+# 再以 (先验权重 × 稳健权重) 做加权最小二乘，直到矩阵收敛或达到 max_iter。
+# 结束时 r > outlier_threshold * s 的样本标记为离群点，可只重测这些色块。
+ROBUST_LOSSES = {"huber": 1.345, "tukey": 4.685}
+MAD_SCALE = 1.4826
+
+def _robust_weights(r, scale, loss, c):
+    u = r / (c * scale)
+    if loss == "huber":
+        return np.minimum(1.0, 1.0 / np.maximum(u, 1e-300))
+    return np.where(u < 1, (1 - u * u) ** 2, 0.0)
+
+def _residuals(C, XYZ_measured, XYZ_target, relative):
+    r = np.linalg.norm(XYZ_measured @ C.T - XYZ_target, axis=1)
+    if relative:
+        r /= np.maximum(np.linalg.norm(XYZ_target, axis=1), 1e-12)
+    return r
+
+def _irls(solve, XYZ_measured, XYZ_target, w, loss, c, max_iter, tol, outlier_threshold, relative):
+    """solve(weights) -> C；返回 (C, info)。"""
+    if loss not in ROBUST_LOSSES:
+        raise ValueError(f"loss must be one of {tuple(ROBUST_LOSSES)}")
+    c = ROBUST_LOSSES[loss] if c is None else float(c)
+    n = XYZ_measured.shape[0]
+    prior = np.ones(n) if w is None else np.asarray(w, float).reshape(-1)
+    if prior.size != n:
+        raise ValueError("weights length mismatch")
+
+    robust = np.ones(n)
+    C = solve(prior)
+    converged = False
+    it = 0
+    for it in range(1, max_iter + 1):
+        r = _residuals(C, XYZ_measured, XYZ_target, relative)
+        scale = MAD_SCALE * np.median(r[prior > 0])
+        if not scale > 0:
+            converged = True
+            break
+        robust = _robust_weights(r, scale, loss, c)
+        C_new = solve(prior * robust)
+        delta = np.max(np.abs(C_new - C))
+        C = C_new
+        if delta <= tol * np.max(np.abs(C)):
+            converged = True
+            break
+
+    r = _residuals(C, XYZ_measured, XYZ_target, relative)
+    scale = MAD_SCALE * np.median(r[prior > 0])
+    info = {
+        "weights": robust,
+        "residuals": r,
+        "scale": float(scale),
+        "outliers": r > outlier_threshold * scale if scale > 0 else np.zeros(n, dtype=bool),
+        "iterations": it,
+        "converged": converged,
+    }
+    return C, info
+
+def fit_XYZ2XYZ_robust(XYZ_measured, XYZ_target, XYZ_w_measured=None, XYZ_w_target=None, w=None, l2=0.0,
+                       loss="huber", c=None, max_iter=50, tol=1e-8, outlier_threshold=3.0, relative=False):
+    """
+    稳健（IRLS）拟合 3x3 矩阵 C，使得 C @ X_meas ≈ X_tgt。
+    给出 XYZ_w_measured / XYZ_w_target 时保持白点硬约束（同 fit_XYZ2XYZ_wlock），否则同 fit_XYZ2XYZ。
+    参数:
+      w / l2: 先验权重与 L2 正则，与稳健权重相乘后参与每轮拟合
+      loss: "huber" 或 "tukey"；c: 调节常数，None 取各自默认值
+      max_iter: 最大迭代次数；tol: 矩阵相对变化小于 tol 时停止
+      outlier_threshold: 残差超过 outlier_threshold 倍稳健尺度的样本标记为离群点
+      relative: 残差除以 ||X_tgt||，样本间量级差异大时使用
+    返回:
+      C: (3,3)
+      info: {"weights": (n,) 稳健权重 0..1, "residuals": (n,) 残差范数, "scale": 稳健尺度,
+             "outliers": (n,) bool, "iterations": int, "converged": bool}
+    """
+    XYZ_measured = np.asarray(XYZ_measured, float)
+    XYZ_target  = np.asarray(XYZ_target,  float)
+    if XYZ_measured.ndim != 2 or XYZ_measured.shape[1] != 3 or XYZ_target.shape != XYZ_measured.shape:
+        raise ValueError("X_meas/X_tgt must be (n,3) with the same shape")
+    if (XYZ_w_measured is None) != (XYZ_w_target is None):
+        raise ValueError("XYZ_w_measured and XYZ_w_target must be given together")
+    if XYZ_w_measured is None:
+        solve = lambda ww: fit_XYZ2XYZ(XYZ_measured, XYZ_target, w=ww, l2=l2)
+    else:
+        solve = lambda ww: fit_XYZ2XYZ_wlock(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_target, w=ww, l2=l2)
+    return _irls(solve, XYZ_measured, XYZ_target, w, loss, c, max_iter, tol, outlier_threshold, relative)
+
+def fit_XYZ2XYZ_wlock_dropY_robust(XYZ_measured, XYZ_target, XYZ_w_measured, XYZ_w_target, w=None, l2=0.0,
+                                   **robust_kwargs):
+    """
+    fit_XYZ2XYZ_wlock_dropY 的稳健版本（只拟合色度，保持白点硬约束），参数见 fit_XYZ2XYZ_robust。
+    按 xy 重建的样本 X/Z 量级随 y 变化（低 y 的蓝色偏大），默认使用相对残差（relative=True）。
+    info 中各数组仍对应全部 n 个输入样本：xy 无效、未参与拟合的样本权重为 0、残差为 nan、不标记为离群点。
+    """
+    robust_kwargs.setdefault("relative", True)
+    xyz_measured_fixed, xyz_target_fixed, valid = _dropY_samples(XYZ_measured, XYZ_target)
+    xyz_w_measured_fixed, xyz_w_target_fixed = _dropY_white(XYZ_w_measured, XYZ_w_target)
+    C, sub = fit_XYZ2XYZ_robust(xyz_measured_fixed, xyz_target_fixed, xyz_w_measured_fixed, xyz_w_target_fixed,
+                                w=_valid_weights(w, valid), l2=l2, **robust_kwargs)
+    info = dict(sub)
+    for key, fill in (("weights", 0.0), ("residuals", np.nan), ("outliers", False)):
+        full = np.full(valid.size, fill, dtype=sub[key].dtype)
+        full[valid] = sub[key]
+        info[key] = full
+    return C, info
+
+
 if __name__ == "__main__":
     X_meas = [[0.0078652003, 0.008075561, 0.006818738500000001], [0.0069408186, 0.008730198900000001, 0.0051397427], [0.0079000496, 0.0092610949, 0.0047605614], [0.0065731655, 0.007169774099999999, 0.0098863041], [0.007509592000000001, 0.0089061028, 0.010106587700000001], [0.0056101579, 0.0044552922000000005, 0.0027226421], [0.007878178, 0.008971732, 0.0041017991], [0.0061226825, 0.0051003034, 0.0095902299], [0.0046982521, 0.0031712193, 0.0001316159], [4.4054900000000004e-05, 4.57357e-05, 6.489509999999999e-05], [4.40254e-05, 4.57186e-05, 6.48683e-05], [4.4023800000000004e-05, 4.56963e-05, 6.48454e-05], [4.4021500000000005e-05, 4.56914e-05, 6.48329e-05], [0.0055001202999999995, 0.0080246046, 0.0047528409], [0.0053988231, 0.0034796068, 0.0039944026], [0.0058462124, 0.006222207499999999, 0.006553691600000001], [0.0082832403, 0.0088134912, 0.0093092413], [0.0100569658, 0.0107003057, 0.0112877289], [0.0114737568, 0.012209679, 0.012860023799999998], ]
     X_tgt = [[0.01576605838519226, 0.014793345271452893, 0.009970309415828525], [0.01092674840436487, 0.017306340640453676, 0.005700912210972972], [0.015499428779093122, 0.019454179936645232, 0.004993372673676908], [0.010122452212660907, 0.011328531625233272, 0.02162328089683309], [0.012364366516017099, 0.017581398801256382, 0.022224557535119344], [0.011399097897517363, 0.006361368324091146, 0.001995336027121758], [0.016239494708729617, 0.018515338385249918, 0.0038187885419577947], [0.01045186609319093, 0.006637316424143144, 0.02105631417314377], [0.010579597633660915, 0.004978634180546313, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.006487197794573525, 0.015243580002886758, 0.004965509423006897], [0.011279869700242579, 0.00525026662411291, 0.003978717676085563], [0.008110132510765956, 0.00853288646, 0.009292806135617022], [0.016220265021531913, 0.01706577292, 0.018585612271234044], [0.02433039753229787, 0.02559865938, 0.027878418406851062], [0.032440530043063825, 0.03413154584, 0.03717122454246809], ]
@@ -0,0 +1,228 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from convert_utils import *
+from lut1d import Lut1D3
+from icc_rw import ICCProfile
+from delta_e_report import DeltaEStats
+
+# MHC2 管线的软件模拟，用于在不安装 ICC 的情况下预览/回归测试生成的配置文件。
+# 输入帧约定为 BT.2020 PQ 编码的 RGB（HDR10），处理顺序与 Windows 高级颜色管线一致：
+#   PQ 解码 → 线性 BT.2020 → XYZ → MHC2 矩阵 (XYZ→XYZ) → 线性 BT.2020 → PQ 编码 → 1D LUT（PQ 域）
+# 三个矩阵预先合成为一个线性 BT.2020 上的 3x3 矩阵。
+
+
+DEFAULT_TILE_ROWS = 256
+
+
+def _code_max(dtype, bit_depth):
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return None
+    if dtype not in (np.uint8, np.uint16):
+        raise ValueError("image dtype must be uint8, uint16 or float")
+    if bit_depth is None:
+        bit_depth = dtype.itemsize * 8
+    if not 1 <= bit_depth <= dtype.itemsize * 8:
+        raise ValueError(f"bit_depth {bit_depth} does not fit into {dtype}")
+    return float((1 << bit_depth) - 1)
+
+
+class MHC2Pipeline:
+    """
+    由 MHC2 数据（read_MHC2 的字典）构建的图像处理管线。
+    mhc2: {"matrix": 9 个数或 None, "red_lut"/"green_lut"/"blue_lut": LUT 或 None}
+    lut_method: LUT 插值方式，默认 "linear"（相邻表项线性插值，2 项的空 LUT 即为恒等）；
+                "nearest" 与 apply_lut 默认行为一致，"cubic" 为单调三次
+    fast_pq: 是否使用查表 PQ，None 跟随 convert_utils.PQ_FAST
+    dtype: 计算精度 np.float32 / np.float64，None 跟随 convert_utils.FLOAT_DTYPE；
+           float32 时 PQ、矩阵与 LUT 全程为 float32，内存与带宽减半；
+           与 float64 相比仅在近黑（矩阵相消后 < 0.01 nit）处可能相差数个码值
+    """
+
+    def __init__(self, mhc2, lut_method="linear", fast_pq=None, dtype=None):
+        matrix = mhc2.get("matrix")
+        M = np.eye(3) if matrix is None else np.asarray(matrix, dtype=float).reshape(3, 3)
+        rgb_matrix = XYZ_TO_BT2020 @ M @ BT2020_TO_XYZ
+        self.matrix = M
+        self._rgb_matrix_t = np.ascontiguousarray(rgb_matrix.T)
+        self.is_identity_matrix = bool(np.allclose(M, np.eye(3), rtol=0, atol=1e-12))
+
+        chans = [mhc2.get(c + "_lut") for c in Lut1D3.CHANNELS]
+        if any(c is None or len(c) < 2 for c in chans):
+            self.lut = None
+        else:
+            self.lut = Lut1D3(*chans, copy=False)
+        self.lut_method = lut_method
+        self.fast_pq = fast_pq
+        self.dtype = dtype
+
+    @classmethod
+    def from_icc(cls, icc, **kwargs):
+        """icc: ICCProfile 或 .icc 文件路径。"""
+        if not isinstance(icc, ICCProfile):
+            icc = ICCProfile(icc)
+        mhc2 = icc.read_MHC2()
+        if mhc2 is None:
+            raise ValueError("profile has no MHC2 tag")
+        return cls(mhc2, **kwargs)
+
+    def _dtype(self):
+        return get_float_dtype() if self.dtype is None else self.dtype
+
+    def apply_pq(self, rgb_pq):
+        """
+        对 (..., 3) 的 PQ 归一化值 (0..1) 应用整条管线，返回 PQ 值（精度见 dtype）。
+        """
+        dtype = self._dtype()
+        rgb = np.asarray(rgb_pq, dtype=dtype)
+        if not self.is_identity_matrix:
+            lin = pq_decode(rgb, fast=self.fast_pq, dtype=dtype)
+            lin = np.matmul(lin, self._rgb_matrix_t.astype(dtype, copy=False), out=lin)
+            rgb = pq_encode(lin, fast=self.fast_pq, dtype=dtype)
+        else:
+            rgb = np.clip(rgb, 0.0, 1.0)
+        if self.lut is not None:
+            rgb = apply_lut(rgb, self.lut, self.lut_method, dtype=dtype)
+        return rgb
+
+    def apply(self, image, out=None, bit_depth=None, tile_rows=DEFAULT_TILE_ROWS):
+        """
+        image: (H, W, 3) 的 uint8 / uint16 / float 图像（可为 np.memmap），按 tile_rows 行分块处理。
+        out: 可选输出数组（可为 np.memmap），形状与 dtype 需与 image 相同；默认新建
+        bit_depth: 整数图像的有效位数，如 uint16 容器中的 10bit；默认取满 dtype
+        返回与输入同 dtype 的结果；整数输出四舍五入并裁剪到码值范围。
+        """
+        if image.ndim != 3 or image.shape[-1] != 3:
+            raise ValueError("image must be (H, W, 3)")
+        code_max = _code_max(image.dtype, bit_depth)
+        if out is None:
+            out = np.empty(image.shape, dtype=image.dtype)
+        elif out.shape != image.shape or out.dtype != image.dtype:
+            raise ValueError("out must match image shape and dtype")
+
+        tile_rows = max(int(tile_rows), 1)
+        for r0 in range(0, image.shape[0], tile_rows):
+            r1 = min(r0 + tile_rows, image.shape[0])
+            tile = np.asarray(image[r0:r1], dtype=self._dtype())
+            if code_max is not None:
+                tile /= code_max
+            res = self.apply_pq(tile)
+            if code_max is not None:
+                res *= code_max
+                np.rint(res, out=res)
+                np.clip(res, 0, code_max, out=res)
+            out[r0:r1] = res
+        return out
+
+    def apply_raw(self, src_path, width, height, dtype=np.uint16, dst_path=None,
+                  offset=0, bit_depth=None, tile_rows=DEFAULT_TILE_ROWS):
+        """
+        处理无文件头的交错 RGB 原始帧（行优先，H x W x 3），输入以 memmap 只读映射。
+        dst_path: 输出原始帧路径（同格式，memmap 写入）；为 None 时返回内存中的数组
+        offset: 输入文件中帧数据的字节偏移（多帧文件可按帧大小递增）
+        """
+        src = load_raw_frame(src_path, width, height, dtype, offset)
+        out = None
+        if dst_path is not None:
+            out = np.memmap(dst_path, dtype=src.dtype, mode="w+", shape=src.shape)
+        res = self.apply(src, out=out, bit_depth=bit_depth, tile_rows=tile_rows)
+        if dst_path is not None:
+            res.flush()
+        return res
+
+
+def load_raw_frame(path, width, height, dtype=np.uint16, offset=0):
+    """以只读 memmap 打开 (height, width, 3) 的原始交错 RGB 帧。"""
+    return np.memmap(path, dtype=np.dtype(dtype), mode="r", offset=offset,
+                     shape=(int(height), int(width), 3))
+
+
+def compare_images(before, after, tile_rows=DEFAULT_TILE_ROWS):
+    """
+    前后对比：逐通道码值差的统计，按 tile 分块计算以支持 memmap 大图。
+    返回 {"max_abs": (3,), "mean_abs": (3,), "changed_ratio": float}；
+    整数图像以码值为单位，浮点图像以 PQ 归一化值为单位。
+    """
+    if before.shape != after.shape:
+        raise ValueError("images must have the same shape")
+    max_abs = np.zeros(3)
+    sum_abs = np.zeros(3)
+    changed = 0
+    n_pix = before.shape[0] * before.shape[1]
+    for r0 in range(0, before.shape[0], max(int(tile_rows), 1)):
+        r1 = min(r0 + tile_rows, before.shape[0])
+        d = np.abs(np.asarray(after[r0:r1], dtype=float) - np.asarray(before[r0:r1], dtype=float))
+        d = d.reshape(-1, 3)
+        max_abs = np.maximum(max_abs, d.max(axis=0, initial=0.0))
+        sum_abs += d.sum(axis=0)
+        changed += int(np.count_nonzero(d.any(axis=1)))
+    return {
+        "max_abs": max_abs,
+        "mean_abs": sum_abs / max(n_pix, 1),
+        "changed_ratio": changed / max(n_pix, 1),
+    }
+
+
+IMAGE_ENCODINGS = ("pq", "linear", "xyz")
+
+
+def _image_to_ictcp(tile, code_max, encoding, dtype):
+    """(h, W, 3) 图像块 → ICtCp；BT.2020 RGB 输入直接走 RGB → LMS，不经过 XYZ。"""
+    x = np.asarray(tile, dtype=dtype)
+    if code_max is not None:
+        x = x / dtype(code_max)
+    if encoding == "xyz":
+        return XYZ_to_ictcp(x, dtype)
+    lin = pq_decode(x, dtype=dtype) if encoding == "pq" else x
+    lms = rgb2020_linear_to_lms(lin, dtype)
+    lmsp = pq_encode(np.clip(lms, 0.0, 1.0, out=lms), dtype=dtype)
+    return lms_p_to_ictcp(lmsp, dtype)
+
+
+def delta_e_itp_map(before, after, out=None, bit_depth=None, encoding="pq",
+                    tile_rows=DEFAULT_TILE_ROWS, workers=1, dtype=np.float32,
+                    resolution=0.01, limit=100.0):
+    """
+    逐像素 ΔE ITP 热力图，按 tile_rows 行分块处理，内存占用与图像大小无关。
+    before / after: (H, W, 3) 的 uint8 / uint16 / float 图像（可为 np.memmap），dtype 可以不同
+    out: 可选的 (H, W) 浮点输出（可为 np.memmap）；默认新建 float32 数组
+    bit_depth: 整数图像的有效位数，见 MHC2Pipeline.apply
+    encoding: 像素含义，"pq"（BT.2020 PQ，HDR10）/ "linear"（线性 BT.2020，1 = 10000 nit）/ "xyz"（归一化 XYZ）
+    workers: 线程数，>1 时各分块在线程池中并行（NumPy 运算期间释放 GIL）；None 为线程池默认线程数
+    dtype: 计算精度，默认 float32（相对 float64 的 ΔE ITP 偏差 < 0.1，两幅图像各自的 ICtCp 误差可叠加，见 tests/test_float32_precision.py）
+    resolution / limit: 统计直方图参数，见 DeltaEStats
+    返回 (out, DeltaEStats)，后者可直接 summary()，或与其他帧的结果 merge。
+    """
+    if before.shape != after.shape or before.ndim != 3 or before.shape[-1] != 3:
+        raise ValueError("images must be (H, W, 3) with the same shape")
+    if encoding not in IMAGE_ENCODINGS:
+        raise ValueError(f"encoding must be one of {IMAGE_ENCODINGS}")
+    dtype = np.dtype(dtype).type
+    code_max = (_code_max(before.dtype, bit_depth), _code_max(after.dtype, bit_depth))
+    if out is None:
+        out = np.empty(before.shape[:2], dtype=np.float32)
+    elif out.shape != before.shape[:2]:
+        raise ValueError("out must have shape (H, W)")
+
+    def run(r0):
+        r1 = min(r0 + tile_rows, before.shape[0])
+        d = _image_to_ictcp(after[r0:r1], code_max[1], encoding, dtype)
+        d -= _image_to_ictcp(before[r0:r1], code_max[0], encoding, dtype)
+        d *= d
+        d[..., 1] *= 0.25
+        de = np.sqrt(d.sum(axis=-1))
+        de *= 720
+        out[r0:r1] = de
+        return DeltaEStats(resolution, limit).update(de)
+
+    tile_rows = max(int(tile_rows), 1)
+    starts = range(0, before.shape[0], tile_rows)
+    stats = DeltaEStats(resolution, limit)
+    if workers is not None and workers <= 1:
+        for r0 in starts:
+            stats.merge(run(r0))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for tile_stats in pool.map(run, starts):
+                stats.merge(tile_stats)
+    return out, stats
@@ -0,0 +1,103 @@
+import numpy as np
+from numba import njit, prange
+
+# convert_utils 的可选 Numba 后端（逐元素 / 逐样本内核，多线程、无临时数组）。
+# 仅在安装了 numba 时由 convert_utils.set_backend("numba") 导入；未安装时不会被加载。
+# 所有内核与 NumPy 实现逐步骤一致，输入为 C 连续 float64，结果写入 out。
+
+# ST 2084 常数（与 convert_utils 相同）
+m1 = 2610 / 16384
+m2 = 2523 / 32
+c1 = 3424 / 4096
+c2 = 2413 / 128
+c3 = 2392 / 128
+
+
+@njit(inline="always")
+def _clip01(v):
+    if v < 0.0:
+        return 0.0
+    if v > 1.0:
+        return 1.0
+    return v
+
+
+@njit(inline="always")
+def _pq_encode1(v):
+    p = _clip01(v) ** m1
+    return ((c1 + c2 * p) / (1.0 + c3 * p)) ** m2
+
+
+@njit(inline="always")
+def _pq_decode1(v):
+    e = _clip01(v) ** (1.0 / m2)
+    num = max(e - c1, 0.0)
+    den = c2 - c3 * e
+    if den <= 0.0 or v != v:
+        return np.nan
+    return _clip01(max(num / den, 0.0) ** (1.0 / m1))
+
+
+@njit(parallel=True, cache=True)
+def pq_encode(x, out):
+    for i in prange(x.size):
+        out[i] = _pq_encode1(x[i])
+    return out
+
+
+@njit(parallel=True, cache=True)
+def pq_decode(x, out):
+    for i in prange(x.size):
+        out[i] = _pq_decode1(x[i])
+    return out
+
+
+@njit(parallel=True, cache=True)
+def mat3(v, m, out):
+    """out[i] = m @ v[i]，v: (M, 3)。"""
+    for i in prange(v.shape[0]):
+        a, b, c = v[i, 0], v[i, 1], v[i, 2]
+        for r in range(3):
+            out[i, r] = m[r, 0] * a + m[r, 1] * b + m[r, 2] * c
+    return out
+
+
+@njit(parallel=True, cache=True)
+def xyz_to_ictcp(xyz, to_2020, to_lms, to_ictcp, out):
+    """XYZ → BT.2020 线性(去负) → LMS(去负, ≤1) → PQ → ICtCp，逐样本融合计算。"""
+    for i in prange(xyz.shape[0]):
+        x, y, z = xyz[i, 0], xyz[i, 1], xyz[i, 2]
+        r = max(to_2020[0, 0] * x + to_2020[0, 1] * y + to_2020[0, 2] * z, 0.0)
+        g = max(to_2020[1, 0] * x + to_2020[1, 1] * y + to_2020[1, 2] * z, 0.0)
+        b = max(to_2020[2, 0] * x + to_2020[2, 1] * y + to_2020[2, 2] * z, 0.0)
+        lp = _pq_encode1(max(to_lms[0, 0] * r + to_lms[0, 1] * g + to_lms[0, 2] * b, 0.0))
+        mp = _pq_encode1(max(to_lms[1, 0] * r + to_lms[1, 1] * g + to_lms[1, 2] * b, 0.0))
+        sp = _pq_encode1(max(to_lms[2, 0] * r + to_lms[2, 1] * g + to_lms[2, 2] * b, 0.0))
+        for k in range(3):
+            out[i, k] = to_ictcp[k, 0] * lp + to_ictcp[k, 1] * mp + to_ictcp[k, 2] * sp
+    return out
+
+
+@njit(parallel=True, cache=True)
+def lut3x1d(rgb, table, linear, out):
+    """
+    逐通道 1D LUT，rgb: (M, 3)，table: (3, N)。
+    linear=False 为最近邻（四舍五入到最近表项），True 为线性插值；输入裁剪到 [0,1]。
+    """
+    n = table.shape[1]
+    scale = n - 1
+    for i in prange(rgb.shape[0]):
+        for c in range(3):
+            v = rgb[i, c]
+            if v != v:
+                out[i, c] = table[c, 0] if not linear else np.nan
+                continue
+            p = _clip01(v) * scale
+            if not linear:
+                out[i, c] = table[c, int(np.rint(p))]
+            else:
+                k = min(int(p), scale - 1)
+                t = p - k
+                y0 = table[c, k]
+                out[i, c] = y0 + (table[c, k + 1] - y0) * t
+    return out
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("numba")
+
+import convert_utils as cu
+from lut1d import Lut1D3
+
+# numba 与 numpy 后端逐内核的最大绝对误差上限（实测 <= 1.4e-13，LUT 完全一致）
+BOUNDS = {
+    "pq_encode": 1e-12,
+    "pq_decode": 1e-12,
+    "mat3": 1e-12,
+    "xyz_to_ictcp": 1e-12,
+    "lut3x1d/nearest": 0.0,
+    "lut3x1d/linear": 1e-12,
+}
+
+rng = np.random.default_rng(0)
+N = 100000
+V = rng.random(N) * 1.2 - 0.1
+XYZ = rng.random((N, 3)) * 0.2
+LUT = Lut1D3(np.sort(rng.random((3, 4096)), axis=1))
+
+CASES = {
+    "pq_encode": lambda: cu.pq_encode(V, fast=False),
+    "pq_decode": lambda: cu.pq_decode(V, fast=False),
+    "mat3": lambda: cu.XYZ_to_bt2020_linear(XYZ),
+    "xyz_to_ictcp": lambda: cu.XYZ_to_ictcp(XYZ),
+    "lut3x1d/nearest": lambda: cu.apply_lut(XYZ * 5, LUT, "nearest"),
+    "lut3x1d/linear": lambda: cu.apply_lut(XYZ * 5, LUT, "linear"),
+}
+
+
+@pytest.fixture
+def restore_backend():
+    prev = cu.BACKEND
+    yield
+    cu.set_backend(prev)
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_numba_matches_numpy(name, restore_backend):
+    assert cu.set_backend("numba") == "numba"
+    got = CASES[name]()
+    cu.set_backend("numpy")
+    ref = CASES[name]()
+    assert got.shape == ref.shape
+    assert np.array_equal(np.isnan(got), np.isnan(ref))
+    assert np.nanmax(np.abs(got - ref)) <= BOUNDS[name]
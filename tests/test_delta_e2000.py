@@ -0,0 +1,134 @@
+import numpy as np
+
+from delteE import deltaE2000
+
+# Sharma, Wu & Dalal (2005) CIEDE2000 测试数据：(L1, a1, b1, L2, a2, b2, ΔE00)，ΔE00 保留 4 位小数
+SHARMA_CIEDE2000_DATA = (
+    (50.0000, 2.6772, -79.7751, 50.0000, 0.0000, -82.7485, 2.0425),
+    (50.0000, 3.1571, -77.2803, 50.0000, 0.0000, -82.7485, 2.8615),
+    (50.0000, 2.8361, -74.0200, 50.0000, 0.0000, -82.7485, 3.4412),
+    (50.0000, -1.3802, -84.2814, 50.0000, 0.0000, -82.7485, 1.0000),
+    (50.0000, -1.1848, -84.8006, 50.0000, 0.0000, -82.7485, 1.0000),
+    (50.0000, -0.9009, -85.5211, 50.0000, 0.0000, -82.7485, 1.0000),
+    (50.0000, 0.0000, 0.0000, 50.0000, -1.0000, 2.0000, 2.3669),
+    (50.0000, -1.0000, 2.0000, 50.0000, 0.0000, 0.0000, 2.3669),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0009, 7.1792),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0010, 7.1792),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0011, 7.2195),
+    (50.0000, 2.4900, -0.0010, 50.0000, -2.4900, 0.0012, 7.2195),
+    (50.0000, -0.0010, 2.4900, 50.0000, 0.0009, -2.4900, 4.8045),
+    (50.0000, -0.0010, 2.4900, 50.0000, 0.0010, -2.4900, 4.8045),
+    (50.0000, -0.0010, 2.4900, 50.0000, 0.0011, -2.4900, 4.7461),
+    (50.0000, 2.5000, 0.0000, 50.0000, 0.0000, -2.5000, 4.3065),
+    (50.0000, 2.5000, 0.0000, 73.0000, 25.0000, -18.0000, 27.1492),
+    (50.0000, 2.5000, 0.0000, 61.0000, -5.0000, 29.0000, 22.8977),
+    (50.0000, 2.5000, 0.0000, 56.0000, -27.0000, -3.0000, 31.9030),
+    (50.0000, 2.5000, 0.0000, 58.0000, 24.0000, 15.0000, 19.4535),
+    (50.0000, 2.5000, 0.0000, 50.0000, 3.1736, 0.5854, 1.0000),
+    (50.0000, 2.5000, 0.0000, 50.0000, 3.2972, 0.0000, 1.0000),
+    (50.0000, 2.5000, 0.0000, 50.0000, 1.8634, 0.5757, 1.0000),
+    (50.0000, 2.5000, 0.0000, 50.0000, 3.2592, 0.3350, 1.0000),
+    (60.2574, -34.0099, 36.2677, 60.4626, -34.1751, 39.4387, 1.2644),
+    (63.0109, -31.0961, -5.8663, 62.8187, -29.7946, -4.0864, 1.2630),
+    (61.2901, 3.7196, -5.3901, 61.4292, 2.2480, -4.9620, 1.8731),
+    (35.0831, -44.1164, 3.7933, 35.0232, -40.0716, 1.5901, 1.8645),
+    (22.7233, 20.0904, -46.6940, 23.0331, 14.9730, -42.5619, 2.0373),
+    (36.4612, 47.8580, 18.3852, 36.2715, 50.5065, 21.2231, 1.4146),
+    (90.8027, -2.0831, 1.4410, 91.1528, -1.6435, 0.0447, 1.4441),
+    (90.9257, -0.5406, -0.9208, 88.6381, -0.8985, -0.7239, 1.5381),
+    (6.7747, -0.2908, -2.4247, 5.8714, -0.0985, -2.2286, 0.6377),
+    (2.0776, 0.0795, -1.1350, 0.9033, -0.0636, -0.5514, 0.9082),
+)
+
+# 向量化实现与逐样本实现的差异仅来自 NumPy 数组与标量超越函数的舍入
+BATCH_TOLERANCE = 1e-12
+
+
+def _deltaE2000_scalar(lab1, lab2, kL=1, kC=1, kH=1):
+    """逐样本标量实现（向量化之前的版本），作为对照。"""
+    L1, a1, b1 = lab1
+    L2, a2, b2 = lab2
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    avg_C = (C1 + C2) / 2.0
+
+    G = 0.5 * (1 - np.sqrt((avg_C**7) / (avg_C**7 + 25**7)))
+    a1p = (1 + G) * a1
+    a2p = (1 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    avg_Cp = (C1p + C2p) / 2.0
+
+    h1p = (np.degrees(np.arctan2(b1, a1p)) % 360)
+    h2p = (np.degrees(np.arctan2(b2, a2p)) % 360)
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+
+    dhp = h2p - h1p
+    if dhp > 180: dhp -= 360
+    elif dhp < -180: dhp += 360
+    if C1p * C2p == 0: dhp = 0.0
+
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp) / 2)
+
+    avg_Lp = (L1 + L2) / 2.0
+    if abs(h1p - h2p) > 180:
+        avg_hp = (h1p + h2p + 360) / 2.0
+    else:
+        avg_hp = (h1p + h2p) / 2.0
+    if C1p * C2p == 0:
+        avg_hp = h1p + h2p
+
+    T = (1
+         - 0.17 * np.cos(np.radians(avg_hp - 30))
+         + 0.24 * np.cos(np.radians(2 * avg_hp))
+         + 0.32 * np.cos(np.radians(3 * avg_hp + 6))
+         - 0.20 * np.cos(np.radians(4 * avg_hp - 63)))
+
+    d_ro = 30 * np.exp(-((avg_hp - 275) / 25)**2)
+    RC = 2 * np.sqrt((avg_Cp**7) / (avg_Cp**7 + 25**7))
+    SL = 1 + (0.015 * (avg_Lp - 50)**2) / np.sqrt(20 + (avg_Lp - 50)**2)
+    SC = 1 + 0.045 * avg_Cp
+    SH = 1 + 0.015 * avg_Cp * T
+    RT = -np.sin(np.radians(2 * d_ro)) * RC
+
+    return np.sqrt(
+        (dLp / (kL * SL))**2 +
+        (dCp / (kC * SC))**2 +
+        (dHp / (kH * SH))**2 +
+        RT * (dCp / (kC * SC)) * (dHp / (kH * SH))
+    )
+
+
+def _random_lab_pairs(n=20000, seed=0):
+    """随机 Lab 对，含零彩度（a = b = 0）与跨 0/360 度的色相差。"""
+    rng = np.random.default_rng(seed)
+    lab1 = np.column_stack([rng.uniform(0, 100, n), rng.uniform(-128, 128, (n, 2))])
+    lab2 = lab1 + rng.normal(0, 10, (n, 3))
+    lab1[::50, 1:] = 0
+    lab2[::70, 1:] = 0
+    return lab1, lab2
+
+
+def test_sharma_data():
+    data = np.array(SHARMA_CIEDE2000_DATA)
+    dE = deltaE2000(data[:, :3], data[:, 3:6])
+    assert np.max(np.abs(dE - data[:, 6])) < 1e-4
+
+
+def test_single_sample_matches_scalar_path():
+    lab1, lab2 = _random_lab_pairs()
+    for a, b in zip(lab1, lab2):
+        dE = deltaE2000(a, b)
+        assert np.ndim(dE) == 0
+        assert dE == _deltaE2000_scalar(a, b)
+
+
+def test_batch_matches_scalar_path():
+    lab1, lab2 = _random_lab_pairs()
+    ref = np.array([_deltaE2000_scalar(a, b) for a, b in zip(lab1, lab2)])
+    dE = deltaE2000(lab1, lab2)
+    assert dE.shape == ref.shape
+    assert np.max(np.abs(dE - ref)) <= BATCH_TOLERANCE
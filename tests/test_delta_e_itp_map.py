@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from convert_utils import BT2020_linear_to_XYZ, pq_decode
+from delteE import XYZdeltaE_ITP
+from mhc2_emulator import delta_e_itp_map
+from test_float32_precision import DELTA_E_ITP_BOUND
+
+CODE_MAX = 1023
+
+
+@pytest.fixture(scope="module")
+def images():
+    """随机 10bit PQ 图像对（uint16 容器），尺寸不是 tile_rows 的整数倍。"""
+    rng = np.random.default_rng(0)
+    before = rng.integers(0, CODE_MAX + 1, (37, 53, 3)).astype(np.uint16)
+    after = np.clip(before.astype(int) + rng.integers(-20, 21, before.shape), 0, CODE_MAX).astype(np.uint16)
+    return before, after
+
+
+def _reference(before, after):
+    """逐像素解码到 XYZ 后用 float64 XYZdeltaE_ITP 计算。"""
+    def xyz(img):
+        return BT2020_linear_to_XYZ(pq_decode(img / CODE_MAX, fast=False, dtype=np.float64), np.float64)
+    return XYZdeltaE_ITP(xyz(before), xyz(after), np.float64)
+
+
+def test_matches_xyz_delta_e(images):
+    before, after = images
+    ref = _reference(before, after)
+    de64, stats = delta_e_itp_map(before, after, bit_depth=10, dtype=np.float64,
+                                  out=np.empty(before.shape[:2]))
+    assert np.max(np.abs(de64 - ref)) < 1e-5
+    assert stats.count == ref.size
+    assert stats.max == pytest.approx(np.max(de64))
+
+    de32, _ = delta_e_itp_map(before, after, bit_depth=10)
+    assert de32.dtype == np.float32
+    assert np.max(np.abs(de32 - ref)) < DELTA_E_ITP_BOUND
+
+
+@pytest.mark.parametrize("tile_rows, workers", [(1, 1), (5, 3), (16, None), (64, 2)])
+def test_tiling_and_workers_invariant(images, tile_rows, workers):
+    before, after = images
+    ref, ref_stats = delta_e_itp_map(before, after, bit_depth=10)
+    de, stats = delta_e_itp_map(before, after, bit_depth=10, tile_rows=tile_rows, workers=workers)
+    assert np.array_equal(de, ref)
+    assert stats.count == ref_stats.count
+    assert np.array_equal(stats._hist, ref_stats._hist)
+    assert (stats.min, stats.max) == (ref_stats.min, ref_stats.max)
+    assert stats.total == pytest.approx(ref_stats.total, rel=1e-12)
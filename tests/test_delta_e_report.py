@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from delta_e_report import DeltaEReport, DeltaEStats
+
+RESOLUTION = 0.01
+LIMIT = 100.0
+QS = np.arange(0, 101)
+
+
+def _values(n, seed):
+    """偏态的 ΔE 分布，少量值超过 limit。"""
+    rng = np.random.default_rng(seed)
+    v = rng.gamma(1.5, 1.2, n)
+    v[rng.random(n) < 0.02] = rng.uniform(LIMIT, 3 * LIMIT, 1)[0] + rng.random()
+    return v
+
+
+@pytest.mark.parametrize("n, seed", [(1, 0), (2, 1), (7, 2), (1000, 3), (50000, 4)])
+def test_percentiles_within_resolution(n, seed):
+    v = _values(n, seed)
+    stats = DeltaEStats(RESOLUTION, LIMIT).update(v)
+    got = stats.percentile(QS)
+    assert np.max(np.abs(got - np.percentile(v, QS))) <= RESOLUTION
+    assert stats.count == n
+    assert stats.mean == pytest.approx(v.mean())
+    assert (stats.min, stats.max) == (v.min(), v.max())
+
+
+def test_values_over_limit_exact():
+    v = np.array([0.5, 150.0, 250.0, 120.0])
+    stats = DeltaEStats(RESOLUTION, LIMIT).update(v)
+    assert stats.percentile([50, 100]).tolist() == np.percentile(v, [50, 100]).tolist()
+
+
+def test_nan_counted_separately():
+    v = np.array([1.0, np.nan, 2.0, np.nan, 3.0])
+    stats = DeltaEStats(RESOLUTION, LIMIT).update(v)
+    assert (stats.count, stats.nan_count) == (3, 2)
+    assert abs(stats.percentile(50) - 2.0) <= RESOLUTION
+    assert stats.mean == pytest.approx(2.0)
+
+
+def test_empty():
+    stats = DeltaEStats(RESOLUTION, LIMIT).update(np.array([np.nan]))
+    assert stats.count == 0
+    assert np.isnan(stats.mean)
+    assert np.isnan(stats.percentile(50))
+    assert np.all(np.isnan(stats.percentile([0, 100])))
+    summary = stats.summary()
+    assert summary["count"] == 0
+    assert all(np.isnan(summary[k]) for k in ("mean", "min", "max", "p50", "p95", "p99"))
+
+
+def test_split_and_merge_equivalent():
+    v = _values(20000, 5)
+    whole = DeltaEStats(RESOLUTION, LIMIT).update(v)
+    merged = DeltaEStats(RESOLUTION, LIMIT)
+    for part in np.array_split(v, [0, 13, 5000, 5001, 12345]):
+        merged.merge(DeltaEStats(RESOLUTION, LIMIT).update(part))
+    assert merged.count == whole.count
+    assert np.array_equal(merged._hist, whole._hist)
+    assert np.array_equal(merged._over, whole._over)
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+    assert merged.total == pytest.approx(whole.total, rel=1e-12)
+    assert np.allclose(merged.percentile(QS), whole.percentile(QS), rtol=0, atol=1e-12)
+    assert np.max(np.abs(merged.percentile(QS) - np.percentile(v, QS))) <= RESOLUTION
+
+
+def test_merge_rejects_different_bins():
+    with pytest.raises(ValueError):
+        DeltaEStats(0.01, 100.0).merge(DeltaEStats(0.02, 100.0))
+
+
+def test_report_mask_and_samples():
+    rng = np.random.default_rng(6)
+    target = rng.random((50, 3)) * 0.02
+    measured = target * (1 + rng.normal(0, 0.02, target.shape))
+    mask = rng.random(50) < 0.7
+    report = DeltaEReport()
+    de = report.add(target, measured, mask=mask)
+    assert de["itp"].shape == (50,)
+    assert report.stats["itp"].count == mask.sum()
+    _, _, kept = report.samples()
+    assert np.array_equal(kept["itp"], de["itp"][mask])
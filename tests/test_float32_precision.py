@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from convert_utils import *
+from delteE import XYZdeltaE_ITP
+
+# float32 计算路径相对 float64 的最大偏差上限（以 ΔE ITP 计，1 = 1 JND）。
+# 固定种子下实测：ICtCp 0.034，PQ 编解码 0.010，PQ + LUT 0.013，查表 PQ + LUT 0.0002，ΔE ITP 0.049
+ICTCP_BOUND = 0.05
+PQ_ROUNDTRIP_BOUND = 0.02
+PQ_LUT_BOUND = 0.02
+PQ_LUT_FAST_BOUND = 0.001
+# 两个颜色各自的 ICtCp 偏差可叠加
+DELTA_E_ITP_BOUND = 2 * ICTCP_BOUND
+
+N = 200000
+LUT_SIZE = 4096
+
+
+@pytest.fixture(scope="module")
+def data():
+    """BT.2020 色域内 0~1000 nit 的随机 XYZ（亮度按对数分布，覆盖暗部）与随机单调 LUT。"""
+    rng = np.random.default_rng(0)
+    rgb = rng.random((N, 3))
+    rgb *= 10.0 ** rng.uniform(-4, -1, (N, 1))
+    xyz = BT2020_linear_to_XYZ(rgb, np.float64)
+    xyz_ref = xyz[rng.permutation(N)]
+    lut = Lut1D3(np.sort(rng.random((3, LUT_SIZE)), axis=1) * 0.2
+                 + np.linspace(0, 0.8, LUT_SIZE), copy=False)
+    return xyz, xyz_ref, lut
+
+
+def _pipeline(x, dtype, lut=None, fast=False):
+    """XYZ → PQ RGB →（可选 1D LUT）→ XYZ，全程使用 dtype。"""
+    pq = pq_encode(XYZ_to_bt2020_linear(x, dtype), fast=fast, dtype=dtype)
+    if lut is not None:
+        pq = apply_lut(pq, lut, "linear", dtype=dtype)
+    return BT2020_linear_to_XYZ(pq_decode(pq, fast=fast, dtype=dtype), dtype)
+
+
+def _deviation(a32, a64):
+    """float32 结果转回 float64 后与 float64 结果的最大 ΔE ITP。"""
+    return np.max(XYZdeltaE_ITP(a32.astype(np.float64), a64, np.float64))
+
+
+def test_ictcp(data):
+    xyz = data[0]
+    itp32 = XYZ_to_ictcp(xyz.astype(np.float32), np.float32)
+    assert itp32.dtype == np.float32
+    d = itp32.astype(np.float64) - XYZ_to_ictcp(xyz, np.float64)
+    assert np.max(720 * np.sqrt(d[:, 0]**2 + 0.25 * d[:, 1]**2 + d[:, 2]**2)) < ICTCP_BOUND
+
+
+def test_pq_roundtrip(data):
+    xyz = data[0]
+    res32 = _pipeline(xyz.astype(np.float32), np.float32)
+    assert res32.dtype == np.float32
+    assert _deviation(res32, _pipeline(xyz, np.float64)) < PQ_ROUNDTRIP_BOUND
+
+
+@pytest.mark.parametrize("fast, bound", [(False, PQ_LUT_BOUND), (True, PQ_LUT_FAST_BOUND)])
+def test_pq_lut(data, fast, bound):
+    xyz, _, lut = data
+    res32 = _pipeline(xyz.astype(np.float32), np.float32, lut, fast)
+    assert res32.dtype == np.float32
+    assert _deviation(res32, _pipeline(xyz, np.float64, lut, fast)) < bound
+
+
+def test_delta_e_itp(data):
+    xyz, xyz_ref, _ = data
+    de32 = XYZdeltaE_ITP(xyz.astype(np.float32), xyz_ref.astype(np.float32), np.float32)
+    de64 = XYZdeltaE_ITP(xyz, xyz_ref, np.float64)
+    assert np.max(np.abs(de32.astype(np.float64) - de64)) < DELTA_E_ITP_BOUND
+
+
+def test_lut_float32_tables_cached():
+    rgb = np.random.default_rng(1).random((1000, 3)).astype(np.float32)
+    lut3d = Lut3D.identity(17)
+    out = lut3d.apply(rgb, dtype=np.float32)
+    assert out.dtype == np.float32
+    flat32 = lut3d._flat32
+    assert flat32 is not None and flat32.dtype == np.float32
+    lut3d.apply(rgb, chunk=100, dtype=np.float32)
+    assert lut3d._flat32 is flat32
+
+    lut1d3 = Lut1D3(np.sort(np.random.default_rng(2).random((3, 4096)), axis=1))
+    ref = lut1d3.apply(rgb, "cubic")
+    out = lut1d3.apply(rgb, "cubic", dtype=np.float32)
+    tables = (lut1d3._data32, lut1d3._slopes32)
+    assert all(t is not None and t.dtype == np.float32 for t in tables)
+    lut1d3.apply(rgb, "cubic", dtype=np.float32)
+    assert lut1d3._data32 is tables[0] and lut1d3._slopes32 is tables[1]
+    assert np.max(np.abs(out - ref)) < 1e-6
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+import pytest
+
+from icc_rw import ICCProfile
+
+EMPTY_ICC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hdr_empty.icc")
+
+
+def _mhc2(red_lut):
+    lut = np.linspace(0, 1, 4096)
+    return {"entry_count": len(lut), "min_luminance": 0.0, "peak_luminance": 1000.0,
+            "matrix": np.eye(3).ravel().tolist(), "red_lut": red_lut, "green_lut": lut, "blue_lut": lut}
+
+
+def test_lut_roundtrip():
+    icc = ICCProfile(EMPTY_ICC)
+    lut = np.linspace(0, 1, 4096) ** 2
+    icc.write_MHC2(_mhc2(lut))
+    icc.rebuild()
+    got = icc.read_MHC2()
+    assert np.max(np.abs(np.asarray(got["red_lut"]) - lut)) <= 0.5 / 65536
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, 40000.0, -40000.0])
+def test_invalid_lut_values_raise(bad):
+    icc = ICCProfile(EMPTY_ICC)
+    lut = np.linspace(0, 1, 4096)
+    lut[7] = bad
+    with pytest.raises(ValueError):
+        icc.write_MHC2(_mhc2(lut))
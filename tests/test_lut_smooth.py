@@ -0,0 +1,39 @@
+import numpy as np
+
+from lut import (fit_monotone_curve, generate_mhc2_lut_from_measured_pq,
+                 generate_mhc2_lut_from_measured_pq_batch)
+
+
+def _response(x):
+    """模拟的显示器灰阶响应（输入 PQ → 实测 PQ），单调且平滑。"""
+    return 0.9 * x ** 1.1 + 0.02 * np.sin(3 * x)
+
+
+def test_sparse_smooth_lut_close_to_dense():
+    rng = np.random.default_rng(0)
+    x33 = np.linspace(0, 1, 33)
+    noisy = _response(x33) + rng.normal(0, 2e-4, x33.size)
+    lut, residuals = generate_mhc2_lut_from_measured_pq(noisy, smooth=True, return_residuals=True)
+    dense = generate_mhc2_lut_from_measured_pq(_response(np.linspace(0, 1, 1024)))
+    assert lut.shape == dense.shape == (4096,)
+    assert np.all(np.diff(lut) >= 0)
+    assert np.max(np.abs(lut - dense)) < 2e-3
+    assert residuals.shape == (33,)
+    assert np.max(np.abs(residuals)) < 1e-3
+
+
+def test_residuals_match_fit():
+    rng = np.random.default_rng(1)
+    real = _response(np.linspace(0, 1, 17)) + rng.normal(0, 1e-3, (3, 17))
+    lut, residuals = generate_mhc2_lut_from_measured_pq_batch(real, smooth=True, return_residuals=True)
+    assert residuals.shape == real.shape
+    for row, res in zip(real, residuals):
+        assert np.array_equal(res, fit_monotone_curve(row)[1])
+    assert np.array_equal(lut, generate_mhc2_lut_from_measured_pq_batch(real, smooth=True))
+
+
+def test_clamp_residuals():
+    real = np.array([[0.0, 0.2, 0.15, 0.5, 1.0]])
+    lut, residuals = generate_mhc2_lut_from_measured_pq_batch(real, return_residuals=True)
+    assert np.allclose(residuals, [[0.0, 0.0, -0.05, 0.0, 0.0]])
+    assert np.array_equal(lut, generate_mhc2_lut_from_measured_pq_batch(real))
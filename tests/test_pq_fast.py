@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import convert_utils as cu
+import lut
+
+# 查表 PQ 相对解析公式的最大绝对误差上限（与 convert_utils 中的说明一致；实测 6.1e-8 / 4.4e-8）
+ENCODE_BOUND = 7e-8
+DECODE_BOUND = 5e-8
+# 每个表格区间内的等分采样点数
+PROBE = 8
+
+
+@pytest.fixture
+def global_settings():
+    prev_fast = cu.PQ_FAST
+    prev_dtype = cu.get_float_dtype()
+    yield
+    cu.set_pq_fast(prev_fast)
+    cu.set_float_dtype(prev_dtype)
+
+
+def _probe_points():
+    u = np.linspace(0, 1, cu.PQ_TABLE_SIZE * PROBE + 1)
+    return u, u * u * u * u
+
+
+def test_fast_encode_error():
+    _, lin = _probe_points()
+    err = np.abs(cu.pq_encode(lin, fast=True) - cu.pq_encode(lin, fast=False))
+    assert np.max(err) <= ENCODE_BOUND
+
+
+def test_fast_decode_error():
+    u, _ = _probe_points()
+    err = np.abs(cu.pq_decode(u, fast=True) - cu.pq_decode(u, fast=False))
+    assert np.max(err) <= DECODE_BOUND
+
+
+def test_eetf_params_ignore_global_settings(global_settings):
+    args = (0.005, 1000.0, 0.05, 600.0)
+    exact = [float(cu.pq_oetf(v, fast=False, dtype=np.float64)) for v in args]
+    lut.bt2390eetf_params.cache_clear()
+    cu.set_pq_fast(True)
+    cu.set_float_dtype(np.float32)
+    Vb, Vw, KS, b, maxLum = lut.bt2390eetf_params(*args)
+    cu.set_pq_fast(False)
+    cu.set_float_dtype(np.float64)
+    assert (Vb, Vw) == (exact[0], exact[1])
+    assert maxLum == (exact[3] - exact[0]) / (exact[1] - exact[0])
+    assert lut.bt2390eetf_params(*args) == (Vb, Vw, KS, b, maxLum)
+
+
+def test_transfer_table_ignores_global_settings(global_settings):
+    src, dst = ("pq", None), ("gamma", 2.2)
+    lut.clear_transfer_table_cache()
+    cu.set_pq_fast(True)
+    cu.set_float_dtype(np.float32)
+    table = lut.transfer_table(src, dst, 1000)
+    cu.set_pq_fast(False)
+    cu.set_float_dtype(np.float64)
+    x = np.linspace(0, 1, lut.TRANSFER_TABLE_SIZE)
+    assert table.values.dtype == np.float64
+    assert np.array_equal(table.values, lut.convert_transfer(x, src, dst, 1000))
+    assert lut.transfer_table(src, dst, 1000) is table
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from lut import convert_transfer, transfer_table
+
+CASES = [
+    (("pq", None), ("gamma", 2.2)),
+    (("gamma", 2.2), ("srgb", None)),
+    (("srgb", None), ("gamma", 2.4)),
+]
+
+
+@pytest.mark.parametrize("src, dst", CASES)
+def test_fast_within_max_error(src, dst):
+    x = np.random.default_rng(0).random(100000)
+    table = transfer_table(src, dst)
+    err = np.abs(convert_transfer(x, src, dst, fast=True) - convert_transfer(x, src, dst))
+    # max_error 为区间内 1/8 步长的实测值，真实上限在其 1.2 倍以内
+    assert np.max(err) <= 1.2 * table.max_error + 1e-15
+
+
+@pytest.mark.parametrize("src, dst", CASES)
+def test_nan_matches_exact_path(src, dst):
+    v = np.array([0.5, np.nan, 0.25])
+    fast = convert_transfer(v, src, dst, fast=True)
+    exact = convert_transfer(v, src, dst)
+    assert np.array_equal(np.isnan(fast), np.isnan(exact))
+    assert np.isnan(fast[1])
+    assert np.allclose(fast[[0, 2]], exact[[0, 2]], rtol=0, atol=1e-6)
+    assert np.isnan(convert_transfer(np.nan, src, dst, fast=True))
@@ -19,6 +19,7 @@ from win_display import install_icc,uninstall_icc,cp_remove_display_association,
 from convert_utils import *
 from matrix import *
 from lut import eetf_from_lut
+from lut1d import Lut1D3
 from monitor_info import get_edid_info
 from i18n.i18n_loader import _
 
@@ -571,10 +572,7 @@ class CyberFixerApp(tk.Tk):
         red_lut = eetf_from_lut(self.MHC2["red_lut"], eetf_args)
         blue_lut = eetf_from_lut(self.MHC2["blue_lut"], eetf_args)
         green_lut = eetf_from_lut(self.MHC2["green_lut"], eetf_args)
-        self.MHC2["red_lut"] = red_lut.tolist()
-        self.MHC2["blue_lut"] = blue_lut.tolist()
-        self.MHC2["green_lut"] = green_lut.tolist()
-        self.MHC2["entry_count"] = len(red_lut)
+        Lut1D3(red_lut, green_lut, blue_lut, copy=False).to_mhc2(self.MHC2)
         
         self.icc_handle.write_MHC2(self.MHC2)
 
@@ -17,10 +17,14 @@ from win_display import get_all_display_config, get_monitor_rect_by_gdi_name, cp
 from win_display import install_icc, uninstall_icc, cp_remove_display_association, luid_from_dict
 from convert_utils import *
 from matrix import *
-from lut import convert_transfer
+from lut import convert_transfer, transfer_table
+from lut1d import Lut1D3
 from monitor_info import get_edid_info
 from i18n.i18n_loader import _
 
+# 生成色调 LUT 时允许使用缓存转换表的最大误差（码值 0..1，约 0.25 个 8bit 码值）
+TRANSFER_TABLE_MAX_ERROR = 1e-3
+
 class GamutMapperApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -377,11 +381,10 @@ class GamutMapperApp(tk.Tk):
             if source_args:
                 dest_args = eo_map.get(info["target_tone"])
                 lut = np.linspace(0, 1, 4096)
-                target = convert_transfer(lut, source_args, dest_args)
-                MHC2["red_lut"] = target.tolist()
-                MHC2["green_lut"] = target.tolist()
-                MHC2["blue_lut"] = target.tolist()
-                MHC2["entry_count"] = 4096
+                # 缓存转换表的误差上限足够小时直接查表，否则（如分段处导数很大的曲线）走解析公式
+                fast = transfer_table(source_args, dest_args).max_error <= TRANSFER_TABLE_MAX_ERROR
+                target = convert_transfer(lut, source_args, dest_args, fast=fast)
+                Lut1D3(target, copy=False).to_mhc2(MHC2)
 
         icc_handle.write_MHC2(MHC2)
 